@@ -0,0 +1,342 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the clustering backends, which each fit k-means to the neighbourhood data in
+their own way, and the choice of which backend to use for a table of a given size.
+
+The built-in backends are scikit-learn's KMeans, scikit-learn's MiniBatchKMeans for very large
+tables, and a k-means written in NumPy alone. The NumPy backend is the quickest for tables as
+small as Toronto's, mostly because it does not have to import scikit-learn, which takes longer
+than clustering a few hundred neighbourhoods. scikit-learn is only imported when one of its
+backends is used.
+
+Every backend returns a KMeansResult, whose attributes are named like those of a fitted
+scikit-learn model, so the rest of the pipeline does not need to know which backend it used.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import time
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from instrumentation import NULL_RECORDER, Recorder
+
+# Tables with at most this many values (rows times columns) are clustered with the NumPy
+# backend when the backend is picked automatically.
+SMALL_TABLE = 50000
+
+# Tables with at least this many rows are clustered with mini-batch k-means when the backend is
+# picked automatically. Full k-means is still quicker on two million rows held in memory, so
+# mini-batches are only worth it for tables too large to fit comfortably.
+LARGE_TABLE = 10000000
+
+# The most iterations of the NumPy backend, and the relative tolerance it stops at, which are
+# the defaults of scikit-learn's KMeans.
+MAX_ITER = 300
+TOLERANCE = 1e-4
+
+
+@dataclass
+class KMeansResult:
+    """A fitted k-means model.
+
+    Instance Attributes:
+        - cluster_centers_: the cluster centers, one row per cluster
+        - labels_: the cluster of each row of the data
+        - inertia_: the sum of the squared distances of the rows to their cluster centers
+        - n_iter_: the number of iterations the fit took
+        - backend: the name of the backend that fitted the model
+    """
+    cluster_centers_: np.ndarray
+    labels_: np.ndarray
+    inertia_: float
+    n_iter_: int
+    backend: str
+
+
+class Backend:
+    """A way of fitting k-means. This is an abstract class; each backend overrides fit.
+
+    Instance Attributes:
+        - name: the name the backend is registered under
+    """
+    name: str
+
+    def fit(self, data: np.ndarray, k: int, random_state: int,
+            init: Optional[np.ndarray] = None) -> KMeansResult:
+        """Return k-means with k clusters fitted to data.
+
+        If init is given, the fit starts from those centers instead of k-means++.
+        """
+        raise NotImplementedError
+
+
+class SklearnBackend(Backend):
+    """scikit-learn's KMeans."""
+
+    def __init__(self) -> None:
+        self.name = 'kmeans'
+
+    def fit(self, data: np.ndarray, k: int, random_state: int,
+            init: Optional[np.ndarray] = None) -> KMeansResult:
+        """Return k-means with k clusters fitted to data with scikit-learn."""
+        from sklearn.cluster import KMeans
+
+        if init is None:
+            model = KMeans(n_clusters=k, random_state=random_state)
+        else:
+            model = KMeans(n_clusters=k, init=init, n_init=1, random_state=random_state)
+        model.fit(data)
+        return KMeansResult(model.cluster_centers_, model.labels_, float(model.inertia_),
+                            int(model.n_iter_), self.name)
+
+
+class MiniBatchBackend(Backend):
+    """scikit-learn's MiniBatchKMeans, which fits each step to a sample of the rows.
+
+    Instance Attributes:
+        - batch_size: the number of rows in each sample
+    """
+    batch_size: int
+
+    def __init__(self, batch_size: int = 4096) -> None:
+        self.name = 'minibatch'
+        self.batch_size = batch_size
+
+    def fit(self, data: np.ndarray, k: int, random_state: int,
+            init: Optional[np.ndarray] = None) -> KMeansResult:
+        """Return k-means with k clusters fitted to data with mini-batches.
+
+        The inertia is that of the final centers over every row, so that it can be compared
+        with the other backends.
+        """
+        from sklearn.cluster import MiniBatchKMeans
+
+        if init is None:
+            model = MiniBatchKMeans(n_clusters=k, batch_size=self.batch_size, n_init=3,
+                                    random_state=random_state)
+        else:
+            model = MiniBatchKMeans(n_clusters=k, init=init, n_init=1,
+                                    batch_size=self.batch_size, random_state=random_state)
+        model.fit(data)
+        labels, inertia = assign(data, model.cluster_centers_)
+        return KMeansResult(model.cluster_centers_, labels, inertia, int(model.n_iter_),
+                            self.name)
+
+
+class NumpyBackend(Backend):
+    """A k-means written in NumPy alone, started with greedy k-means++ like scikit-learn.
+
+    With algorithm 'lloyd', every row is compared with every center in each iteration. With
+    algorithm 'elkan', each row also keeps bounds on its distance to its own center and to the
+    next closest one, which are moved by how far the centers moved, and a row is only compared
+    with the centers again when its bounds no longer show that its cluster is unchanged. This
+    is Hamerly's simplification of Elkan's algorithm, which keeps one lower bound per row
+    rather than one per row and center.
+
+    Instance Attributes:
+        - algorithm: 'lloyd' or 'elkan'
+        - n_init: the number of times k-means is run from different starting centers, of which
+          the run with the lowest inertia is kept
+    """
+    algorithm: str
+    n_init: int
+
+    def __init__(self, algorithm: str = 'lloyd', n_init: int = 3) -> None:
+        self.name = 'numpy' if algorithm == 'lloyd' else 'numpy-' + algorithm
+        self.algorithm = algorithm
+        self.n_init = n_init
+
+    def fit(self, data: np.ndarray, k: int, random_state: int,
+            init: Optional[np.ndarray] = None) -> KMeansResult:
+        """Return k-means with k clusters fitted to data with NumPy."""
+        data = np.asarray(data, dtype=float)
+        rng = np.random.default_rng(random_state)
+        tolerance = TOLERANCE * data.var(axis=0).mean()
+
+        best = None
+        for _ in range(1 if init is not None else self.n_init):
+            centers = np.array(init, dtype=float) if init is not None \
+                else kmeans_plusplus(data, k, rng)
+            if self.algorithm == 'elkan':
+                result = _bounded_kmeans(data, centers, tolerance)
+            else:
+                result = _lloyd(data, centers, tolerance)
+            if best is None or result[2] < best[2]:
+                best = result
+        centers, labels, inertia, n_iter = best
+        return KMeansResult(centers, labels, inertia, n_iter, self.name)
+
+
+# The backends that can be asked for by name.
+BACKENDS = {backend.name: backend for backend in [SklearnBackend(), MiniBatchBackend(),
+                                                  NumpyBackend(), NumpyBackend('elkan')]}
+
+
+def register_backend(backend: Backend) -> None:
+    """Make backend available under its name."""
+    BACKENDS[backend.name] = backend
+
+
+def select_backend(rows: int, dimensions: int) -> str:
+    """Return the name of the backend best suited to a table with the given number of rows and
+    columns."""
+    if rows * dimensions <= SMALL_TABLE:
+        return 'numpy'
+    elif rows >= LARGE_TABLE:
+        return 'minibatch'
+    return 'kmeans'
+
+
+def fit(data: np.ndarray, k: int, random_state: int, init: Optional[np.ndarray] = None,
+        backend: str = 'auto', recorder: Recorder = NULL_RECORDER) -> KMeansResult:
+    """Return k-means with k clusters fitted to data by the backend with the given name, or by
+    the backend that select_backend picks if backend is 'auto'.
+
+    The fit is reported to recorder as a 'fit' event with the backend, the size of the data
+    and the time the fit took.
+    """
+    data = np.asarray(data, dtype=float)
+    if backend == 'auto':
+        backend = select_backend(data.shape[0], data.shape[1])
+
+    start = time.perf_counter()
+    result = BACKENDS[backend].fit(data, k, random_state, init)
+    recorder.event('fit', backend=backend, rows=data.shape[0], dimensions=data.shape[1], k=k,
+                   seconds=time.perf_counter() - start, inertia=result.inertia_,
+                   n_iter=result.n_iter_)
+    return result
+
+
+def assign(data: np.ndarray, centers: np.ndarray) -> tuple[np.ndarray, float]:
+    """Return the closest center to each row of data, and the sum of the squared distances of
+    the rows to their closest centers."""
+    distances = squared_distances(data, centers)
+    labels = distances.argmin(axis=1)
+    return labels, float(distances[np.arange(len(data)), labels].sum())
+
+
+def squared_distances(data: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Return the squared distance from each row of data to each center."""
+    distances = ((data * data).sum(axis=1)[:, np.newaxis] - 2 * data @ centers.T
+                 + (centers * centers).sum(axis=1)[np.newaxis, :])
+    return np.maximum(distances, 0)
+
+
+def kmeans_plusplus(data: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Return k starting centers picked from the rows of data with greedy k-means++.
+
+    Each center after the first is the best of a few rows sampled with probability
+    proportional to their squared distance from the closest center picked so far.
+    """
+    trials = 2 + int(np.log(k))
+    centers = [data[rng.integers(len(data))]]
+    closest = squared_distances(data, centers[0][np.newaxis, :])[:, 0]
+    for _ in range(1, k):
+        if closest.sum() == 0:
+            candidates = rng.integers(len(data), size=trials)
+        else:
+            candidates = rng.choice(len(data), size=trials, p=closest / closest.sum())
+        candidate_closest = np.minimum(closest[np.newaxis, :],
+                                       squared_distances(data[candidates], data))
+        best = int(candidate_closest.sum(axis=1).argmin())
+        centers.append(data[candidates[best]])
+        closest = candidate_closest[best]
+    return np.array(centers)
+
+
+def _update_centers(data: np.ndarray, labels: np.ndarray, centers: np.ndarray,
+                    distances: np.ndarray) -> np.ndarray:
+    """Return the mean of the rows in each cluster. A cluster left with no rows is moved to
+    the row that is farthest from its own center."""
+    k, dimensions = centers.shape
+    counts = np.bincount(labels, minlength=k)
+    sums = np.zeros((k, dimensions))
+    np.add.at(sums, labels, data)
+    new_centers = centers.copy()
+    filled = counts > 0
+    new_centers[filled] = sums[filled] / counts[filled, np.newaxis]
+    for cluster in np.flatnonzero(~filled):
+        farthest = int(distances.argmax())
+        new_centers[cluster] = data[farthest]
+        distances[farthest] = 0
+    return new_centers
+
+
+def _lloyd(data: np.ndarray, centers: np.ndarray,
+           tolerance: float) -> tuple[np.ndarray, np.ndarray, float, int]:
+    """Return the centers, labels, inertia and number of iterations of Lloyd's algorithm
+    started from centers."""
+    n_iter = 0
+    for n_iter in range(1, MAX_ITER + 1):
+        distances = squared_distances(data, centers)
+        labels = distances.argmin(axis=1)
+        new_centers = _update_centers(data, labels, centers,
+                                      distances[np.arange(len(data)), labels])
+        shift = ((new_centers - centers) ** 2).sum()
+        centers = new_centers
+        if shift <= tolerance:
+            break
+    labels, inertia = assign(data, centers)
+    return centers, labels, inertia, n_iter
+
+
+def _bounded_kmeans(data: np.ndarray, centers: np.ndarray,
+                    tolerance: float) -> tuple[np.ndarray, np.ndarray, float, int]:
+    """Return the centers, labels, inertia and number of iterations of k-means started from
+    centers, skipping the rows whose bounds show that their cluster cannot change (see
+    NumpyBackend)."""
+    rows = np.arange(len(data))
+    distances = np.sqrt(squared_distances(data, centers))
+    labels = distances.argmin(axis=1)
+    upper = distances[rows, labels]
+    distances[rows, labels] = np.inf
+    lower = distances.min(axis=1) if centers.shape[0] > 1 else np.full(len(data), np.inf)
+
+    n_iter = 0
+    for n_iter in range(1, MAX_ITER + 1):
+        new_centers = _update_centers(data, labels, centers, upper ** 2)
+        moved = np.sqrt(((new_centers - centers) ** 2).sum(axis=1))
+        shift = (moved ** 2).sum()
+        centers = new_centers
+        if shift <= tolerance:
+            break
+
+        # moving the centers loosens the bounds by at most how far they moved.
+        upper += moved[labels]
+        lower -= moved.max()
+        between = np.sqrt(squared_distances(centers, centers))
+        np.fill_diagonal(between, np.inf)
+        check = np.flatnonzero(upper > np.maximum(lower, between.min(axis=1)[labels] / 2))
+        if len(check) == 0:
+            continue
+
+        # the rows that might have changed cluster are compared with every center again.
+        check_distances = np.sqrt(squared_distances(data[check], centers))
+        labels[check] = check_distances.argmin(axis=1)
+        upper[check] = check_distances[np.arange(len(check)), labels[check]]
+        check_distances[np.arange(len(check)), labels[check]] = np.inf
+        lower[check] = check_distances.min(axis=1)
+
+    labels, inertia = assign(data, centers)
+    return centers, labels, inertia, n_iter
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['time', 'dataclasses', 'typing', 'numpy', 'instrumentation',
+                          'sklearn.cluster'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200', 'C0415']
+    })
@@ -16,102 +16,66 @@ This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumais
 """
 # Import libraries
 import json
+import pandas as pd
 from plotly import graph_objects as go
 import cluster as c
+import geometry
+import figures
 
 
 def open_file(filename: json) -> json:
-    """Open the json file"""
-    with open(filename) as file:
-        reader = json.load(file)
-    return reader
-
-
-TORONTO_NEIGHBOURHOODS = open_file('neighbourhoods.geojson')
-
-# dataframe
-_, NON_COVID_DATA = c.main()
-
-# Initialize figure
-FIG1 = go.Figure()
-
-# Add Traces
-FIG1.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        hovertext=NON_COVID_DATA['Neighbourhood Name'],
-                        locations=NON_COVID_DATA['Neighbourhood ID'],  # Assign location data,
-                        z=NON_COVID_DATA['Cluster Labels'],  # Assign information data
-                        colorbar={'title': 'Neighbourhood Desirability Index',
-                                  'tickmode': 'array', 'nticks': 3, 'tickvals': [0, 1, 2],
-                                  'ticktext': ['Least Desirable', 'Semi-Desirable',
-                                               'Most Desirable']},
-                        colorscale='Burg',
-                        zauto=True,
-                        showscale=True
-                        ))
-
-FIG1.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        hovertext=NON_COVID_DATA['Neighbourhood Name'],
-                        locations=NON_COVID_DATA['Neighbourhood ID'],  # Assign location data,
-                        z=NON_COVID_DATA['Avg Crime Rate'],  # Assign information data
-                        colorscale='Purpor',
-                        colorbar={'title': 'Crime Rate (per 100,000 people)'},
-                        zauto=True,
-                        showscale=True
-                        ))
-FIG1.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        hovertext=NON_COVID_DATA['Neighbourhood Name'],
-                        locations=NON_COVID_DATA['Neighbourhood ID'],  # Assign location data,
-                        z=NON_COVID_DATA['Avg Property Price'],  # Assign information data
-                        colorscale='tealrose',
-                        colorbar={'title': 'Average Property Price (in millions)'},
-                        zauto=True,
-                        showscale=True
-                        ))
-
-
-# Display Configurations
-FIG1.update_layout(
-    updatemenus=[
-        dict(
-            active=0,
-            buttons=list([
-                dict(label="Desirability Index",
-                     method="update",
-                     args=[{"visible": [True, False, False]},
-                           {"title": "Toronto Neighbourhoods Desirability Index Before Covid"}]),
-                dict(label="Crime Rate",
-                     method="update",
-                     args=[{"visible": [False, True, False]},
-                           {"title": "Crime Rate in Toronto Neighbourhoods Before Covid"}]),
-                dict(label="Property Prices",
-                     method="update",
-                     args=[{"visible": [False, False, True]},
-                           {"title": "Average Property Prices in "
-                                     "Toronto Neighbourhood Before Covid"}]),
-            ]),
-        )
-    ])
-
-# Update layout
-FIG1.update_layout(
-
-    mapbox_style="carto-positron",  # Decide a style for the map
-    mapbox_zoom=9,  # Zoom in scale
-    mapbox_center={"lat": 43.7, "lon": -79.4},  # Center location of the map
-)
+    """Open the json file
+
+    The file is only read once, no matter how many times it is opened.
+    """
+    return geometry.load_geojson(filename)
+
+
+def load_data() -> pd.DataFrame:
+    """Return the pre-covid data, clustered."""
+    _, non_covid_data = c.main()
+    return non_covid_data
+
+
+# The layers of the map, in the order of its menu.
+LAYERS = [
+    figures.Layer('desirability', 'Desirability Index',
+                  'Toronto Neighbourhoods Desirability Index Before Covid', 'Cluster Labels',
+                  'Burg', figures.DESIRABILITY_COLORBAR),
+    figures.Layer('crime', 'Crime Rate', 'Crime Rate in Toronto Neighbourhoods Before Covid',
+                  'Avg Crime Rate', 'Purpor', {'title': 'Crime Rate (per 100,000 people)'}),
+    figures.Layer('price', 'Property Prices',
+                  'Average Property Prices in Toronto Neighbourhood Before Covid',
+                  'Avg Property Price', 'tealrose',
+                  {'title': 'Average Property Price (in millions)'})
+]
+
+# The map of the pre-covid data, which is only built when it is first asked for.
+NON_COVID_MAP = figures.LazyFigure(load_data, LAYERS)
+
+
+def build_figure() -> go.Figure:
+    """Return the map of the pre-covid data with every layer."""
+    return NON_COVID_MAP.figure()
+
+
+def __getattr__(name: str) -> object:
+    """Return the module attributes that are computed the first time they are asked for:
+    TORONTO_NEIGHBOURHOODS, NON_COVID_DATA and FIG1."""
+    if name == 'TORONTO_NEIGHBOURHOODS':
+        return geometry.shared_geometry()
+    elif name == 'NON_COVID_DATA':
+        return NON_COVID_MAP.data()
+    elif name == 'FIG1':
+        return NON_COVID_MAP.figure()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['json', 'plotly', 'cluster'],
-        'allowed-io': ['open_file'],
+        'extra-imports': ['json', 'pandas', 'plotly', 'cluster', 'geometry', 'figures'],
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']
     })
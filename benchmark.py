@@ -0,0 +1,269 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the benchmarks of the ingest, join, cluster and render stages of the pipeline.
+The benchmarks run on synthetic data made by scaling up the Toronto data to many times more
+neighbourhoods, and write their results as json so that runs from different commits can be
+compared.
+
+Run this file to benchmark the pipeline or compare two benchmark runs:
+
+    python benchmark.py run --scales 1 10 100 --output results.json
+    python benchmark.py run --scales 10 100 1000 --no-memory --output results.json
+    python benchmark.py compare old_results.json results.json
+
+The 1000x data set has 140,000 neighbourhoods; rendering it takes many minutes.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import argparse
+import csv
+import importlib
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Any, Callable
+import numpy as np
+import cache
+import cluster as c
+import covid_visualization as cv
+import figures
+import geometry
+from loader import SCHEMAS, load_table
+
+# The libraries that the pipeline only imports once a stage needs them. They are imported before
+# any stage is timed, so that the first stage to use one is not charged for importing it.
+LAZY_IMPORTS = ['kneed', 'sklearn.cluster']
+
+# The folder that the synthetic data is generated in.
+BENCHMARK_DIR = os.path.join(cache.CACHE_DIR, 'benchmark')
+
+# The number of neighbourhoods in the Toronto data.
+NEIGHBOURHOODS = 140
+
+# The tolerance of the geometry that is tiled to make the synthetic geometry. It is finer than
+# the geometry the maps use, so that simplifying the synthetic geometry still has work to do.
+SOURCE_TOLERANCE = 0.00005
+
+# The stages of the pipeline that are benchmarked, in order.
+STAGES = ['ingest', 'join', 'frames', 'elbow', 'cluster', 'geometry', 'render']
+
+
+def generate_dataset(scale: int, directory: str, seed: int = 0) -> None:
+    """Write a copy of the five data files and of the geojson file to directory, with scale
+    times as many neighbourhoods as the Toronto data.
+
+    Copy m of the neighbourhood with ID i gets the ID i + 140 * m, its numbers are the real ones
+    with a little random noise, and its boundary is the real one moved over to its own tile of
+    the map. The rows of each file are shuffled so that joining them has real work to do.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    for filename in c.DATA_FILES:
+        rows = c.convert_file(filename)
+        header, rows = rows[0], [row for row in rows[1:] if row]
+        numeric = set(SCHEMAS[filename].numeric.values())
+        synthetic = []
+        for copy in range(scale):
+            for row in rows:
+                new_row = list(row)
+                new_row[0] = str(int(row[0]) + NEIGHBOURHOODS * copy)
+                if copy > 0:
+                    new_row[1] = f'{row[1]} {copy}'
+                    for column in numeric:
+                        value = float(row[column]) * (1 + 0.05 * rng.standard_normal())
+                        new_row[column] = f'{value:.4f}'
+                synthetic.append(new_row)
+
+        with open(os.path.join(directory, filename), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(synthetic[i] for i in rng.permutation(len(synthetic)))
+
+    source = geometry.shared_geometry(tolerance=SOURCE_TOLERANCE)
+    tiles = int(np.ceil(np.sqrt(scale)))
+    features = []
+    for copy in range(scale):
+        dx, dy = 0.5 * (copy % tiles), 0.35 * (copy // tiles)
+        for feature in source['features']:
+            code = feature['properties']['AREA_SHORT_CODE'] + NEIGHBOURHOODS * copy
+            rings = [[[x + dx, y + dy] for x, y in ring]
+                     for ring in feature['geometry']['coordinates']]
+            features.append({'type': 'Feature',
+                             'properties': {'AREA_SHORT_CODE': code, 'AREA_NAME': str(code)},
+                             'geometry': {'type': 'Polygon', 'coordinates': rings}})
+
+    with open(os.path.join(directory, geometry.GEOJSON_FILE), 'w') as file:
+        json.dump({'type': 'FeatureCollection', 'features': features}, file)
+
+
+def measure(stage: Callable[[], Any], memory: bool = True) -> tuple[Any, dict]:
+    """Return the result of calling stage, along with how long it took and how much memory it
+    needed at its peak.
+
+    The time is measured on a first call. If memory is True, stage is called a second time
+    with tracemalloc running, so that tracing does not slow down the timed call.
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = stage()
+    timings = {'seconds': time.perf_counter() - wall_start,
+               'cpu_seconds': time.process_time() - cpu_start,
+               'peak_bytes': None}
+
+    if memory:
+        tracemalloc.start()
+        stage()
+        timings['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result, timings
+
+
+def benchmark_dataset(directory: str, memory: bool = True) -> list[dict]:
+    """Return the measurements of every stage of the pipeline run on the data in directory."""
+    for module in LAZY_IMPORTS:
+        importlib.import_module(module)
+    paths = {filename: os.path.join(directory, filename) for filename in c.DATA_FILES}
+    results = []
+
+    def run(stage: str, function: Callable[[], Any]) -> Any:
+        result, timings = measure(function, memory)
+        results.append({'stage': stage, **timings})
+        return result
+
+    tables = run('ingest', lambda: {filename: load_table(path, SCHEMAS[filename])
+                                    for filename, path in paths.items()})
+    keys, names, covid, non_covid = run('join', lambda: c.join_features(
+        tables['property_prices.csv'], tables['vaccine_trends.csv'],
+        tables['neighbourhood_cases.csv'], tables['neighbourhood_crime_rates.csv'],
+        tables['neighbourhood_census.csv']))
+    features = c.feature_cache.FeatureMatrices(np.array(keys, dtype=str),
+                                               np.array(names, dtype=str), covid, non_covid)
+    covid_data, _ = run('frames', lambda: c.feature_frames(features))
+    kclusters = run('elbow', lambda: c.elbow_method(covid_data))
+    clustered = run('cluster',
+                    lambda: c.determine_neighbourhood_appeal(covid_data.copy(), kclusters))
+
+    with open(os.path.join(directory, geometry.GEOJSON_FILE)) as file:
+        source = json.load(file)
+    simplified = run('geometry', lambda: geometry.simplify_geojson(source, geometry.TOLERANCE,
+                                                                   geometry.PRECISION))
+    run('render', lambda: figures.LazyFigure(lambda: clustered, cv.LAYERS,
+                                             lambda: simplified).figure().to_json())
+
+    for result in results:
+        result['rows'] = len(keys)
+    return results
+
+
+def run_benchmarks(scales: list[int], memory: bool = True, seed: int = 0) -> dict:
+    """Return the results of benchmarking the pipeline on data scaled by each of the given
+    scales, along with what they were run on."""
+    results = []
+    for scale in scales:
+        directory = os.path.join(BENCHMARK_DIR, f'scale_{scale}_seed_{seed}')
+        if not os.path.exists(os.path.join(directory, geometry.GEOJSON_FILE)):
+            generate_dataset(scale, directory, seed)
+        for result in benchmark_dataset(directory, memory):
+            results.append({'scale': scale, **result})
+
+    return {'commit': _git_commit(), 'python': platform.python_version(),
+            'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results}
+
+
+def compare(old: dict, new: dict, threshold: float = 1.2) -> str:
+    """Return a table comparing the time and memory of each stage in two benchmark runs.
+
+    Stages that got more than threshold times slower or bigger are marked as regressions.
+    """
+    old_results = {(result['scale'], result['stage']): result for result in old['results']}
+    lines = [f'{old["commit"]} -> {new["commit"]}',
+             f'{"scale":>6} {"stage":<9} {"old s":>9} {"new s":>9} {"ratio":>6} '
+             f'{"old MiB":>9} {"new MiB":>9} {"ratio":>6}']
+    for result in new['results']:
+        before = old_results.get((result['scale'], result['stage']))
+        if before is None:
+            continue
+        time_ratio = result['seconds'] / max(before['seconds'], 1e-9)
+        line = (f'{result["scale"]:>6} {result["stage"]:<9} {before["seconds"]:>9.3f} '
+                f'{result["seconds"]:>9.3f} {time_ratio:>6.2f}')
+        memory_ratio = None
+        if result['peak_bytes'] is not None and before['peak_bytes'] is not None:
+            memory_ratio = result['peak_bytes'] / max(before['peak_bytes'], 1)
+            line += (f' {before["peak_bytes"] / 2 ** 20:>9.1f} '
+                     f'{result["peak_bytes"] / 2 ** 20:>9.1f} {memory_ratio:>6.2f}')
+        if time_ratio > threshold or (memory_ratio is not None and memory_ratio > threshold):
+            line += '  REGRESSION'
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def format_results(run: dict) -> str:
+    """Return a table of the results of a benchmark run."""
+    lines = [f'commit {run["commit"]}, python {run["python"]}',
+             f'{"scale":>6} {"rows":>8} {"stage":<9} {"seconds":>9} {"cpu s":>9} {"peak MiB":>9}']
+    for result in run['results']:
+        peak = result['peak_bytes']
+        lines.append(f'{result["scale"]:>6} {result["rows"]:>8} {result["stage"]:<9} '
+                     f'{result["seconds"]:>9.3f} {result["cpu_seconds"]:>9.3f} '
+                     + (f'{peak / 2 ** 20:>9.1f}' if peak is not None else f'{"-":>9}'))
+    return '\n'.join(lines)
+
+
+def _git_commit() -> str:
+    """Return the commit that the benchmarks are run on, or 'unknown' outside of git."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='benchmark the pipeline on synthetic data')
+    run_parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--no-memory', action='store_true',
+                            help='skip measuring peak memory, which runs each stage twice')
+    run_parser.add_argument('--output', help='the json file to write the results to')
+
+    generate_parser = commands.add_parser('generate', help='only generate synthetic data')
+    generate_parser.add_argument('scale', type=int)
+    generate_parser.add_argument('directory')
+    generate_parser.add_argument('--seed', type=int, default=0)
+
+    compare_parser = commands.add_parser('compare', help='compare two benchmark runs')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.2)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        benchmark_run = run_benchmarks(args.scales, not args.no_memory, args.seed)
+        print(format_results(benchmark_run))
+        if args.output:
+            with open(args.output, 'w') as output:
+                json.dump(benchmark_run, output, indent=2)
+    elif args.command == 'generate':
+        generate_dataset(args.scale, args.directory, args.seed)
+    else:
+        with open(args.old) as old_file, open(args.new) as new_file:
+            print(compare(json.load(old_file), json.load(new_file), args.threshold))
@@ -0,0 +1,127 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the prebuilt bundle of everything main.py shows: the cluster labels and
+features of each map, the simplified neighbourhood geometry, the plotly json of each map and
+the html pages that draw them.
+
+Checking whether the bundle is up to date only needs the standard library, so while it is,
+main.py can show the maps without importing pandas, scikit-learn, kneed or plotly at all. The
+manifest of the bundle lists the files it was built from, and the bundle is up to date as long
+as none of them has changed.
+
+Run this file to build the bundle:
+
+    python bundle.py --directory bundle --force
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import argparse
+import importlib.metadata
+import json
+import os
+import time
+from typing import Optional
+import cache
+from instrumentation import NULL_RECORDER, Recorder
+
+# The folder that the bundle is built in by default.
+BUNDLE_DIR = 'bundle'
+
+# The file that describes the bundle, within its folder.
+MANIFEST_FILE = 'bundle.json'
+
+# The version of the bundle's layout, which is part of its key so that bundles built in an
+# older layout are rebuilt.
+FORMAT_VERSION = 1
+
+
+def bundle_key(inputs: list[str]) -> str:
+    """Return the key of a bundle built from the given input files with the installed plotly.
+
+    plotly's version is read from its package metadata, so plotly itself is not imported.
+    """
+    return cache.cache_key(inputs, {'format': FORMAT_VERSION,
+                                    'plotly': importlib.metadata.version('plotly')})
+
+
+def load_manifest(directory: str = BUNDLE_DIR) -> Optional[dict]:
+    """Return the manifest of the bundle in directory, or None if there is no bundle there or
+    it is out of date."""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as file:
+            manifest = json.load(file)
+        if manifest['key'] != bundle_key(manifest['inputs']):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    filenames = [manifest['geometry']] + [files[kind] for files in manifest['maps'].values()
+                                          for kind in ['page', 'figure', 'data']]
+    if not all(os.path.exists(os.path.join(directory, filename)) for filename in filenames):
+        return None
+    return manifest
+
+
+def build_bundle(directory: str = BUNDLE_DIR, force: bool = False,
+                 recorder: Recorder = NULL_RECORDER) -> dict:
+    """Build the bundle in directory and return its manifest.
+
+    The maps are exported with export.export_maps, so the files that are already up to date
+    are left alone unless force is True. The manifest is written last, so a bundle whose build
+    was interrupted is never taken to be up to date. Each stage of the build is reported to
+    recorder.
+    """
+    with recorder.stage('import'):
+        import cluster as c
+        import export
+        import geometry
+
+    inputs = c.DATA_FILES + export.SOURCE_FILES + [geometry.GEOJSON_FILE, __file__]
+    with recorder.stage('cluster'):
+        covid_data, non_covid_data = c.main(recorder=recorder)
+    with recorder.stage('export') as record:
+        exported = export.export_maps(directory, ('html', 'json'), force)
+        record['written'] = sum(not file.skipped for file in exported)
+
+    maps = {}
+    with recorder.stage('tables'):
+        for name, data in [('covid', covid_data), ('before_covid', non_covid_data)]:
+            data.to_csv(os.path.join(directory, name + '.csv'), index=False)
+            maps[name] = {'title': export.MAPS[name][1], 'page': name + '.html',
+                          'figure': name + '.json', 'data': name + '.csv'}
+
+    manifest = {'key': bundle_key(inputs), 'inputs': inputs, 'built_at': time.time(),
+                'geometry': export.GEOMETRY_FILE, 'maps': maps}
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def page_paths(manifest: dict, directory: str = BUNDLE_DIR) -> list[str]:
+    """Return the absolute paths of the html pages of the maps in the bundle, in the order they
+    are shown."""
+    return [os.path.abspath(os.path.join(directory, files['page']))
+            for files in manifest['maps'].values()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the bundle of maps shown by main.py.')
+    parser.add_argument('--directory', default=BUNDLE_DIR)
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args()
+
+    build_recorder = Recorder()
+    with build_recorder.stage('build bundle'):
+        build_bundle(args.directory, args.force, build_recorder)
+    print(build_recorder.format_report())
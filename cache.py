@@ -0,0 +1,110 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the cache that keeps the results of the clustering pipeline, both in memory
+for the current session and on disk between runs
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Optional
+
+# The folder that the cached results are written to.
+CACHE_DIR = '.cache'
+
+# The results that have already been computed or loaded during this session.
+_SESSION = {}
+
+
+def cache_key(filenames: list[str], params: dict) -> str:
+    """Return a key that identifies the contents of the given files and the given parameters.
+
+    The key changes whenever any of the files or parameters change.
+    """
+    digest = hashlib.sha256()
+    for filename in filenames:
+        digest.update(filename.encode())
+        digest.update(file_digest(filename).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def file_digest(filename: str) -> str:
+    """Return the sha256 hash of the contents of the given file."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load(key: str) -> Optional[Any]:
+    """Return the result stored under key, or None if there is no such result.
+
+    Results from this session are returned without reading the disk.
+    """
+    if key in _SESSION:
+        return _SESSION[key]
+
+    try:
+        with open(_cache_path(key), 'rb') as file:
+            result = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+    _SESSION[key] = result
+    return result
+
+
+def store(key: str, result: Any) -> None:
+    """Keep result under key for this session and write it to the disk for later runs."""
+    _SESSION[key] = result
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+def clear_session() -> None:
+    """Forget the results kept for this session, leaving the results on the disk alone."""
+    _SESSION.clear()
+
+
+def clear() -> None:
+    """Remove every cached result, both from this session and from the disk."""
+    _SESSION.clear()
+    if os.path.isdir(CACHE_DIR):
+        for filename in os.listdir(CACHE_DIR):
+            if filename.endswith('.pkl'):
+                os.remove(os.path.join(CACHE_DIR, filename))
+
+
+def _cache_path(key: str) -> str:
+    """Return the path of the file that the result stored under key is written to."""
+    return os.path.join(CACHE_DIR, key + '.pkl')
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['hashlib', 'json', 'os', 'pickle', 'typing'],
+        'allowed-io': ['file_digest', 'load', 'store'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,191 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains checks of the parts of the pipeline that we wrote ourselves in place of a
+library, run on the bundled data and on seeded random data so that they always give the same
+answer: the NumPy k-means backend against scikit-learn's KMeans, the bounded (Elkan) form of
+the NumPy backend against plain Lloyd's algorithm, and the grid spatial index against a
+brute-force ray cast over every neighbourhood.
+
+Run this file to run every check, or only some of them:
+
+    python checks.py
+    python checks.py backends
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import argparse
+import sys
+import numpy as np
+import backends
+import cluster as c
+import geometry
+import spatial_index
+from neighbourhoods import NeighbourhoodStore
+
+# The k values that the backends are compared on.
+CHECK_K_VALUES = range(2, 7)
+
+# How much higher than scikit-learn's the inertia of the NumPy backend may be, as a fraction.
+INERTIA_TOLERANCE = 1e-6
+
+# The number of random points the spatial index is checked on.
+CHECK_POINTS = 20000
+
+# The lowest adjusted Rand index allowed between the labels of the NumPy backend and those of
+# scikit-learn, at the number of clusters the elbow method picks.
+MIN_AGREEMENT = 0.95
+
+
+def bundled_stores() -> dict[str, NeighbourhoodStore]:
+    """Return the covid and pre-covid stores of the bundled data, by name."""
+    covid, non_covid = c.feature_stores(c.load_features())
+    return {'covid': covid, 'pre-covid': non_covid}
+
+
+def blobs(rows: int = 5000, dimensions: int = 4, clusters: int = 8,
+          seed: int = 0) -> np.ndarray:
+    """Return seeded random data made of the given number of overlapping clusters."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 5, size=(clusters, dimensions))
+    return centers[rng.integers(clusters, size=rows)] + rng.normal(size=(rows, dimensions))
+
+
+def check_numpy_backend() -> list[str]:
+    """Return the problems found comparing the NumPy backend with scikit-learn's KMeans on the
+    bundled data.
+
+    For every k in CHECK_K_VALUES, the NumPy backend must reach an inertia no worse than
+    scikit-learn's, and at the number of clusters the elbow method picks, its labels must
+    agree with scikit-learn's to an adjusted Rand index of at least MIN_AGREEMENT.
+    """
+    from sklearn.metrics import adjusted_rand_score
+
+    problems = []
+    for name, store in bundled_stores().items():
+        matrix = store.values()
+        kclusters = c.elbow_method(store)
+        for k in CHECK_K_VALUES:
+            numpy_fit = backends.fit(matrix, k, c.RANDOM_STATE, backend='numpy')
+            sklearn_fit = backends.fit(matrix, k, c.RANDOM_STATE, backend='kmeans')
+            if numpy_fit.inertia_ > sklearn_fit.inertia_ * (1 + INERTIA_TOLERANCE):
+                problems.append(f'{name}, k = {k}: the NumPy inertia {numpy_fit.inertia_:.6g} '
+                                f'is worse than scikit-learn\'s {sklearn_fit.inertia_:.6g}')
+            if k == kclusters:
+                agreement = adjusted_rand_score(sklearn_fit.labels_, numpy_fit.labels_)
+                if agreement < MIN_AGREEMENT:
+                    problems.append(f'{name}, k = {k}: the labels only agree to an adjusted '
+                                    f'Rand index of {agreement:.3f}')
+    return problems
+
+
+def check_lloyd_elkan() -> list[str]:
+    """Return the problems found comparing the bounded (Elkan) NumPy k-means with plain Lloyd's
+    algorithm started from the same centers, on the bundled data and on seeded random data.
+
+    The bounds only skip rows whose cluster cannot change, so both must find the same labels,
+    centers and inertia in the same number of iterations.
+    """
+    datasets = {name: store.values() for name, store in bundled_stores().items()}
+    datasets['blobs'] = blobs()
+    problems = []
+    for name, matrix in datasets.items():
+        tolerance = backends.TOLERANCE * matrix.var(axis=0).mean()
+        for k in CHECK_K_VALUES:
+            start = backends.kmeans_plusplus(matrix, k, np.random.default_rng(k))
+            lloyd = backends._lloyd(matrix, start.copy(), tolerance)
+            bounded = backends._bounded_kmeans(matrix, start.copy(), tolerance)
+            if not np.array_equal(lloyd[1], bounded[1]):
+                problems.append(f'{name}, k = {k}: {np.sum(lloyd[1] != bounded[1])} rows are '
+                                f'labelled differently')
+            elif not np.allclose(lloyd[0], bounded[0]) or not np.isclose(lloyd[2], bounded[2]):
+                problems.append(f'{name}, k = {k}: the centers or inertia differ')
+            elif lloyd[3] != bounded[3]:
+                problems.append(f'{name}, k = {k}: {lloyd[3]} iterations against {bounded[3]}')
+    return problems
+
+
+def check_spatial_index(points: int = CHECK_POINTS, seed: int = 0) -> list[str]:
+    """Return the problems found comparing spatial_index.polygon_positions with a brute-force
+    ray cast over every edge of every neighbourhood, on seeded random points spread over the
+    bounding box of the neighbourhoods and a little beyond it.
+
+    Points with a missing coordinate must be outside every neighbourhood.
+    """
+    geojson = geometry.load_geojson(geometry.GEOJSON_FILE)
+    index = spatial_index.build_index(geojson)
+    low, high = index.edges[:, :2].min(axis=0), index.edges[:, :2].max(axis=0)
+    margin = (high - low) * 0.05
+    rng = np.random.default_rng(seed)
+    longitudes, latitudes = rng.uniform(low - margin, high + margin, size=(points, 2)).T
+
+    expected = np.full(points, spatial_index.OUTSIDE)
+    for position, feature in enumerate(geojson['features']):
+        crossings = np.zeros(points, dtype=int)
+        for polygon in geometry._polygons(feature['geometry']):
+            for ring in polygon:
+                ring = np.asarray(ring, dtype=float)[:, :2]
+                for (x0, y0), (x1, y1) in zip(ring, np.roll(ring, -1, axis=0)):
+                    if y0 == y1:
+                        continue
+                    straddles = (y0 > latitudes) != (y1 > latitudes)
+                    crossings += straddles & (longitudes < x0 + (latitudes - y0) * (x1 - x0)
+                                              / (y1 - y0))
+        expected[crossings % 2 == 1] = position
+
+    problems = []
+    found = spatial_index.polygon_positions(index, longitudes, latitudes)
+    wrong = np.flatnonzero(found != expected)
+    if len(wrong) > 0:
+        problems.append(f'{len(wrong)} of {points} points are placed differently, the first at '
+                        f'({longitudes[wrong[0]]}, {latitudes[wrong[0]]})')
+    if (expected >= 0).sum() < points // 4:
+        problems.append('too few of the random points are inside a neighbourhood to tell')
+    missing = spatial_index.polygon_positions(index, np.array([np.nan, low[0]]),
+                                              np.array([low[1], np.nan]))
+    if np.any(missing != spatial_index.OUTSIDE):
+        problems.append('points with a missing coordinate are placed in a neighbourhood')
+    return problems
+
+
+# The checks, by the name they are run by.
+CHECKS = {'backends': check_numpy_backend, 'elkan': check_lloyd_elkan,
+          'spatial': check_spatial_index}
+
+
+def run_checks(names: list[str]) -> dict[str, list[str]]:
+    """Return the problems found by each of the checks with the given names."""
+    return {name: CHECKS[name]() for name in names}
+
+
+def format_problems(problems: dict[str, list[str]]) -> str:
+    """Return a summary of the problems found by each check."""
+    lines = []
+    for name, found in problems.items():
+        lines.append(f'{name:<12} {"ok" if not found else f"{len(found)} problems"}')
+        lines.extend(f'  {problem}' for problem in found)
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the hand-written parts of the pipeline.')
+    parser.add_argument('checks', nargs='*', metavar='check',
+                        help=f'the checks to run, of {", ".join(CHECKS)}; every check is run '
+                             f'if none are given')
+    args = parser.parse_args()
+    for check in args.checks:
+        if check not in CHECKS:
+            parser.error(f'there is no check named {check!r}')
+
+    found_problems = run_checks(args.checks or list(CHECKS))
+    print(format_problems(found_problems))
+    sys.exit(1 if any(found_problems.values()) else 0)
@@ -16,136 +16,618 @@ This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumais
 """
 # Import libraries
 import csv
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Union
+import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from kneed import KneeLocator
+import backends
+import cache
+import feature_cache
+from instrumentation import NULL_RECORDER, Recorder
+from loader import SCHEMAS, ColumnarTable, load_table, table_from_rows
+from neighbourhoods import NeighbourhoodStore
+
+
+# The data files that the pipeline is computed from.
+DATA_FILES = ['neighbourhood_cases.csv', 'neighbourhood_census.csv',
+              'neighbourhood_crime_rates.csv', 'property_prices.csv', 'vaccine_trends.csv']
+
+# The source files that the result of the pipeline depends on, besides the data files.
+SOURCE_FILES = [__file__] + [os.path.join(os.path.dirname(__file__), filename)
+                             for filename in ['loader.py', 'feature_cache.py',
+                                              'neighbourhoods.py', 'backends.py']]
+
+# The parameters used for clustering.
+K_VALUES = range(1, 10)
+RANDOM_STATE = 0
+
+# The clustering backend (see backends.BACKENDS), or 'auto' to pick one by the size of the data.
+BACKEND = 'auto'
+
+# The columns of the covid and pre-covid dataframes.
+COVID_COLUMNS = ['Neighbourhood ID', 'Neighbourhood Name', 'Avg Property Price',
+                 'Avg Vaccination Rate', 'Avg Covid Case Rate', 'Avg Unemployment Rate',
+                 'Avg Crime Rate']
+NON_COVID_COLUMNS = ['Neighbourhood ID', 'Neighbourhood Name', 'Avg Property Price',
+                     'Avg Unemployment Rate', 'Avg Crime Rate']
+
+# How much each column counts towards the desirability of a neighbourhood. Columns that are
+# not listed do not count. Cheaper neighbourhoods are the more desirable ones, as they were on
+# the original maps.
+DESIRABILITY_WEIGHTS = {'Avg Property Price': -1.0, 'Avg Vaccination Rate': 1.0,
+                        'Avg Covid Case Rate': -1.0, 'Avg Unemployment Rate': -1.0,
+                        'Avg Crime Rate': -1.0}
+
+# A dataset is either a list of lists from convert_file or a columnar table from load_table.
+Dataset = Union[list[list], ColumnarTable]
 
+# The data that is clustered is either a dataframe with the Neighbourhood ID and name followed
+# by the numeric columns, or a neighbourhood store.
+ClusterData = Union[pd.DataFrame, NeighbourhoodStore]
 
-def main() -> tuple[pd.DataFrame, pd.DataFrame]:
+
+def main(use_cache: bool = True,
+         recorder: Recorder = NULL_RECORDER) -> tuple[pd.DataFrame, pd.DataFrame]:
     """Returns a tuple with two dataframes after compiling data sets together then computes
     clustering on them.
 
     The first dataframe contains data that is post-covid. The second dataframe contains data
     that is pre-covid
+
+    The result is cached for the rest of the session and on disk, and is only recomputed when
+    one of the data files, the clustering parameters or the source files change.
+
+    Each stage of the pipeline is reported to recorder.
+    """
+    if not use_cache:
+        return run_pipeline(recorder=recorder)
+
+    with recorder.stage('cache lookup') as record:
+        key = cache.cache_key(DATA_FILES + SOURCE_FILES, {'k_values': list(K_VALUES),
+                                                        'random_state': RANDOM_STATE,
+                                                        'backend': BACKEND})
+        result = cache.load(key)
+        record['hit'] = result is not None
+
+    if result is None:
+        result = run_pipeline(recorder=recorder)
+        with recorder.stage('cache store'):
+            cache.store(key, result)
+
+    # Copy the cached dataframes so that callers cannot change the cached result.
+    c_data, non_c_data = result
+    return (c_data.copy(), non_c_data.copy())
+
+
+def run_pipeline(use_feature_cache: bool = True,
+                 recorder: Recorder = NULL_RECORDER) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the post-covid and pre-covid dataframes computed from the data files, without
+    using the cache.
+
+    If use_feature_cache is True, the joined feature matrices are loaded from the compiled
+    feature cache instead of from the csv files whenever the data files have not changed. Each
+    stage of the pipeline is reported to recorder.
     """
 
-    # Converts all files into lists of lists.
-    a = convert_file("neighbourhood_cases.csv")
-    b = convert_file("neighbourhood_census.csv")
-    c = convert_file("neighbourhood_crime_rates.csv")
-    d = convert_file("property_prices.csv")
-    e = convert_file("vaccine_trends.csv")
+    if use_feature_cache:
+        features = load_features(recorder=recorder)
+        with recorder.stage('stores', rows=len(features.ids)):
+            cluster_data1, cluster_data2 = feature_stores(features)
+    else:
+        # Loads all files into columnar tables of numbers.
+        with recorder.stage('ingest') as record:
+            a = load_table("neighbourhood_cases.csv", SCHEMAS["neighbourhood_cases.csv"])
+            b = load_table("neighbourhood_census.csv", SCHEMAS["neighbourhood_census.csv"])
+            c = load_table("neighbourhood_crime_rates.csv",
+                           SCHEMAS["neighbourhood_crime_rates.csv"])
+            d = load_table("property_prices.csv", SCHEMAS["property_prices.csv"])
+            e = load_table("vaccine_trends.csv", SCHEMAS["vaccine_trends.csv"])
+            record['rows'] = len(a) + len(b) + len(c) + len(d) + len(e)
+
+        # Provides us with lists of lists of all data, including covid (covid rates, vaccination
+        # rates, etc.) and lists of lists of data from all data minus the covid data.
+        with recorder.stage('join') as record:
+            covid_data, non_covid_data = combine_datasets(d, e, a, c, b)
+            record['rows'] = len(covid_data)
+
+        with recorder.stage('frames', rows=len(covid_data)):
+            # Convert both covid_data and non_covid_data into dataframes.
+            covid_data = convert_to_dataframe(covid_data)
+            non_covid_data = convert_to_dataframe(non_covid_data)
+
+            # Clean up both datasets (basically just add column names).
+            cluster_data1, cluster_data2 = cleanup_data(covid_data, non_covid_data)
 
-    # Provides us with lists of lists of all data, including covid (covid rates, vaccination
-    # rates, etc.) and lists of lists of data from all data minus the covid data.
-    covid_data, non_covid_data = combine_datasets(d, e, a, c, b)
+    # Determine the optimal number of clusters for both data sets.
+    with recorder.stage('elbow covid', rows=len(cluster_data1)) as record:
+        num_of_clusters1 = elbow_method(cluster_data1, recorder=recorder)
+        record['k'] = num_of_clusters1
+    with recorder.stage('elbow non-covid', rows=len(cluster_data2)) as record:
+        num_of_clusters2 = elbow_method(cluster_data2, recorder=recorder)
+        record['k'] = num_of_clusters2
+
+    with recorder.stage('cluster covid', rows=len(cluster_data1), k=num_of_clusters1):
+        c_data = determine_neighbourhood_appeal(cluster_data1, num_of_clusters1,
+                                                recorder=recorder)
+    with recorder.stage('cluster non-covid', rows=len(cluster_data2), k=num_of_clusters2):
+        non_c_data = determine_neighbourhood_appeal(cluster_data2, num_of_clusters2,
+                                                    recorder=recorder)
 
-    # Convert both covid_data and non_covid_data into dataframes.
-    covid_data = convert_to_dataframe(covid_data)
-    non_covid_data = convert_to_dataframe(non_covid_data)
+    return (c_data, non_c_data)
 
-    # Clean up both datasets (basically just add column names).
-    cluster_data1, cluster_data2 = cleanup_data(covid_data, non_covid_data)
 
-    # Determine the optimal number of clusters for both data sets.
-    num_of_clusters1 = elbow_method(cluster_data1)
-    num_of_clusters2 = elbow_method(cluster_data2)
+def load_features(directory: str = feature_cache.FEATURE_DIR,
+                  recorder: Recorder = NULL_RECORDER) -> feature_cache.FeatureMatrices:
+    """Return the joined feature matrices of the data files.
 
-    c_data = determine_neighbourhood_appeal(cluster_data1, num_of_clusters1)
-    non_c_data = determine_neighbourhood_appeal(cluster_data2, num_of_clusters2)
+    The matrices are memory-mapped from the compiled feature cache in directory when it is up
+    to date, and are otherwise computed from the data files and written to the cache. The
+    cache is only up to date if neither the data files nor the source files that read and join
+    them have changed. Each stage is reported to recorder.
+    """
+    with recorder.stage('feature cache lookup') as record:
+        features = feature_cache.load(DATA_FILES + SOURCE_FILES, directory)
+        record['hit'] = features is not None
+    if features is not None:
+        return features
+
+    with recorder.stage('ingest') as record:
+        tables = {filename: load_table(filename, SCHEMAS[filename]) for filename in DATA_FILES}
+        record['rows'] = sum(len(table) for table in tables.values())
+
+    with recorder.stage('join') as record:
+        keys, names, covid_features, non_covid_features = join_features(
+            tables['property_prices.csv'], tables['vaccine_trends.csv'],
+            tables['neighbourhood_cases.csv'], tables['neighbourhood_crime_rates.csv'],
+            tables['neighbourhood_census.csv'])
+        record['rows'] = len(keys)
+
+    with recorder.stage('feature cache store'):
+        features = feature_cache.FeatureMatrices(np.array(keys, dtype=str),
+                                                 np.array(names, dtype=str),
+                                                 covid_features, non_covid_features)
+        feature_cache.save(features, DATA_FILES + SOURCE_FILES, directory)
+    return features
+
+
+def feature_stores(features: feature_cache.FeatureMatrices) \
+        -> tuple[NeighbourhoodStore, NeighbourhoodStore]:
+    """Return the covid and pre-covid neighbourhood stores, with accurate columns, for the
+    given feature matrices.
+
+    The stores share memory with the feature matrices instead of copying them.
+    """
+    ids = features.ids.tolist()
+    names = features.names.tolist()
+    return (NeighbourhoodStore(ids, names, COVID_COLUMNS[2:], features.covid),
+            NeighbourhoodStore(ids, names, NON_COVID_COLUMNS[2:], features.non_covid))
 
-    return (c_data, non_c_data)
 
+def feature_frames(features: feature_cache.FeatureMatrices) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the covid and pre-covid dataframes, with accurate columns, for the given feature
+    matrices."""
+    covid_store, non_covid_store = feature_stores(features)
+    return covid_store.frame(), non_covid_store.frame()
 
-def determine_neighbourhood_appeal(cluster_data: pd.DataFrame, kclusters: int) -> pd.DataFrame:
-    """Return the mean values in the dataset, grouped into kclusters number of clusters."""
 
-    clustering = cluster_data.copy()
+def determine_neighbourhood_appeal(cluster_data: ClusterData, kclusters: int,
+                                   chunk_size: Optional[int] = None,
+                                   recorder: Recorder = NULL_RECORDER) -> pd.DataFrame:
+    """Return the mean values in the dataset, grouped into kclusters number of clusters.
+
+    A dataframe is given its 'Cluster Labels' column in place and returned, while a
+    neighbourhood store is returned as a new dataframe with that column. If chunk_size is
+    given, the clusters are fitted with mini-batch k-means on chunk_size rows
+    at a time instead of on the whole dataset at once (see stream_neighbourhood_appeal). The
+    fitted model is reported to recorder as a 'kmeans' event.
+    """
 
-    # remove the non-numerical data for the dataframe
-    clustering.drop(labels=['Neighbourhood ID', 'Neighbourhood Name'], axis=1, inplace=True)
+    if chunk_size is not None:
+        if isinstance(cluster_data, NeighbourhoodStore):
+            cluster_data = cluster_data.frame()
+        labels = np.empty(len(cluster_data), dtype=int)
+        start = 0
+        for chunk in stream_neighbourhood_appeal(lambda: iter_chunks(cluster_data, chunk_size),
+                                                 kclusters):
+            labels[start:start + len(chunk)] = chunk['Cluster Labels']
+            start += len(chunk)
+        cluster_data.insert(0, 'Cluster Labels', labels)
+        return cluster_data
+
+    # only the numerical data is clustered.
+    clustering = _numeric_values(cluster_data)
 
     # fits the data to the model with the optimal number of clusters.
-    kmeans = KMeans(n_clusters=kclusters, random_state=0).fit(clustering)
+    kmeans = fit_kmeans(clustering, kclusters, recorder=recorder)
+    recorder.event('kmeans', k=kclusters, n_iter=int(kmeans.n_iter_),
+                   inertia=float(kmeans.inertia_), backend=kmeans.backend)
+    labels = order_labels(kmeans.labels_, kmeans.cluster_centers_,
+                          _numeric_columns(cluster_data), clustering.std(axis=0, ddof=1))
 
     # Insert a column into the dataset that tells us which cluster each neighbourhood belongs in.
-    cluster_data.insert(0, 'Cluster Labels', kmeans.labels_)
+    if isinstance(cluster_data, NeighbourhoodStore):
+        return cluster_data.frame(labels)
+    cluster_data.insert(0, 'Cluster Labels', labels)
+    return cluster_data
 
-    cluster_data['Cluster Labels'] = cluster_data['Cluster Labels'].replace([0, 1, 2], [2, 0, 1])
 
-    return cluster_data
+def fit_kmeans(clustering: Union[pd.DataFrame, np.ndarray], kclusters: int,
+               init: Optional[np.ndarray] = None, backend: Optional[str] = None,
+               recorder: Recorder = NULL_RECORDER) -> backends.KMeansResult:
+    """Return a k-means model with kclusters clusters fitted to the numerical data clustering
+    by the given backend, or by BACKEND if backend is None.
 
+    If init is given, the model starts from those centers instead of k-means++. The fit and
+    its timing are reported to recorder as a 'fit' event.
+    """
+    if backend is None:
+        backend = BACKEND
+    return backends.fit(clustering, kclusters, RANDOM_STATE, init, backend, recorder)
 
-def elbow_method(data: pd.DataFrame) -> int:
-    """Return the optimal number of clusters for the given dataset."""
 
-    # make a copy of the pandas dataframe for clustering
-    clustering = data.copy()
-    # remove the non-numerical data for the dataframe
-    clustering.drop(labels=['Neighbourhood ID', 'Neighbourhood Name'], axis=1, inplace=True)
+def order_labels(labels: np.ndarray, centers: np.ndarray, columns: list[str],
+                 scale: np.ndarray) -> np.ndarray:
+    """Return the cluster labels of a KMeans model renumbered into the order of the
+    desirability index, from 0 for the least desirable cluster up to k - 1 for the most
+    desirable one.
 
-    # make an empty list to keep track of all inertias
-    inertia_list = []
+    centers are the cluster centers of the model and columns the names of their columns. See
+    label_lookup for how the clusters are ordered and what scale is.
+    """
+    return label_lookup(centers, columns, scale)[labels]
+
+
+def label_lookup(centers: np.ndarray, columns: list[str], scale: np.ndarray) -> np.ndarray:
+    """Return an array that maps each cluster of a KMeans model to its place in the order of
+    the desirability index.
+
+    Each center is scored by dividing its columns by scale, the spread of each column in the
+    data, and summing them weighted by DESIRABILITY_WEIGHTS. A column with no spread is left
+    as it is. Clusters with equal scores keep the order KMeans gave them, so the same centers
+    are always ordered the same way.
+    """
+    centers = np.asarray(centers, dtype=float)
+    scale = np.where(np.asarray(scale, dtype=float) == 0, 1, scale)
+    weights = np.array([DESIRABILITY_WEIGHTS.get(column, 0.0) for column in columns])
+
+    scores = (centers / scale) @ weights
+    lookup = np.empty(len(centers), dtype=int)
+    lookup[np.argsort(scores, kind='stable')] = np.arange(len(centers))
+    return lookup
+
+
+def stream_neighbourhood_appeal(chunks: Callable[[], Iterable[pd.DataFrame]], kclusters: int,
+                                passes: int = 3) -> Iterator[pd.DataFrame]:
+    """Yield each chunk of a dataset with a 'Cluster Labels' column telling us which of the
+    kclusters clusters each neighbourhood belongs in.
+
+    chunks is called once for every pass over the dataset, and must return the chunks of the
+    dataset in the same order each time, for example
+    lambda: pd.read_csv('areas.csv', chunksize=100000). The cluster centers are fitted with
+    passes passes of mini-batch k-means, then the chunks are labelled one at a time, so only
+    one chunk is in memory at a time no matter how many rows the dataset has.
+
+    The clusters are numbered in the order of the desirability index, scaled by the standard
+    deviation of each column, which is summed up over the chunks of the first pass, so the
+    labels agree with those of determine_neighbourhood_appeal.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    kmeans = MiniBatchKMeans(n_clusters=kclusters, random_state=RANDOM_STATE)
+
+    # a chunk with fewer rows than clusters cannot start the model, so it is held back until
+    # enough rows have been read.
+    pending = []
+    # the sums are of the values less those of the first row, which keeps the sum of squares
+    # from swamping the variance of columns like the property prices.
+    count, shift, total, total_squares = 0, None, 0.0, 0.0
+    for i in range(passes):
+        for chunk in chunks():
+            values = _numeric_values(chunk)
+            if i == 0 and len(values) > 0:
+                if shift is None:
+                    shift = values[0]
+                count += len(values)
+                total = total + (values - shift).sum(axis=0)
+                total_squares = total_squares + ((values - shift) ** 2).sum(axis=0)
+            pending.append(values)
+            if sum(len(values) for values in pending) >= kclusters:
+                kmeans.partial_fit(np.vstack(pending))
+                pending = []
+    if pending:
+        kmeans.partial_fit(np.vstack(pending))
+    std = np.sqrt(np.maximum(total_squares - total ** 2 / count, 0) / max(count - 1, 1))
+
+    lookup = None
+    for chunk in chunks():
+        if lookup is None:
+            columns = [column for column in chunk.columns
+                       if column not in {'Neighbourhood ID', 'Neighbourhood Name'}]
+            lookup = label_lookup(kmeans.cluster_centers_, columns, std)
+        chunk = chunk.copy()
+        chunk.insert(0, 'Cluster Labels', lookup[kmeans.predict(_numeric_values(chunk))])
+        yield chunk
+
+
+def iter_chunks(data: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield consecutive chunks of data with chunk_size rows each (the last may be smaller)."""
+    for start in range(0, len(data), chunk_size):
+        yield data.iloc[start:start + chunk_size]
+
+
+def _numeric_values(data: ClusterData) -> np.ndarray:
+    """Return the numerical columns of data as an array, leaving out the ID and name.
+
+    The array of a neighbourhood store is a view of the store rather than a copy.
+    """
+    if isinstance(data, NeighbourhoodStore):
+        return data.values()
+    return data.drop(columns=['Neighbourhood ID', 'Neighbourhood Name']).to_numpy(dtype=float)
+
+
+def _numeric_columns(data: ClusterData) -> list[str]:
+    """Return the names of the numerical columns of data."""
+    if isinstance(data, NeighbourhoodStore):
+        return list(data.columns)
+    return [column for column in data.columns
+            if column not in {'Neighbourhood ID', 'Neighbourhood Name'}]
+
+
+def elbow_method(data: ClusterData, k_values: range = K_VALUES,
+                 random_state: int = RANDOM_STATE, n_jobs: int = 1, warm_start: bool = True,
+                 early_stop: bool = True, backend: Optional[str] = None,
+                 recorder: Recorder = NULL_RECORDER) -> int:
+    """Return the optimal number of clusters for the given dataset.
+
+    Every k in k_values is tried in increasing order. When n_jobs is 1 and warm_start is True,
+    each model starts from the centroids of the model before it plus one new centroid (see
+    warm_start_centers). When n_jobs is greater than 1, the k values are fitted independently,
+    n_jobs at a time, on a process pool. When early_stop is True, the search ends as soon as
+    the knee is clear (see knee_is_clear) instead of trying every k. The models are fitted
+    by the given clustering backend, or by BACKEND if backend is None, and every model that is
+    fitted is reported to recorder as a 'kmeans' event.
+
+    If the inertias have no knee, as when k_values has only a few k values, the largest k that
+    was tried is returned, with a warning.
+    """
+    # BACKEND is read now rather than when the function was defined, and passed on explicitly
+    # so that the worker processes use it too.
+    if backend is None:
+        backend = BACKEND
 
-    k_value = range(1, 10)
-    # iterate through each number from 0 to 9 inclusive to find the best k value for our data
-    for k in k_value:
-        # initialize the model and set k to be the number of clusters
-        kmean_model = KMeans(n_clusters=k)
+    # only the numerical data is clustered.
+    clustering = _numeric_values(data)
 
-        # fits the data to the model with k clusters
-        kmean_model.fit(clustering)
+    # make an empty list to keep track of all inertias
+    inertia_list = []
 
-        # the inertia_ method measures the sum of squared distances of samples to their
-        # closest cluster center. a smaller inertia_ is aimed for so that the center of
-        # the cluster
-        # is in the right position.
-        inertia_list.append(kmean_model.inertia_)
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            # fit n_jobs k values at a time so that we can stop once the knee is clear.
+            for i in range(0, len(k_values), n_jobs):
+                batch = k_values[i:i + n_jobs]
+                fits = executor.map(fit_inertia, [clustering] * len(batch), batch,
+                                    [random_state] * len(batch), [None] * len(batch),
+                                    [backend] * len(batch))
+                for k, (inertia, _, n_iter, used) in zip(batch, fits):
+                    recorder.event('kmeans', k=k, n_iter=n_iter, inertia=inertia,
+                                   backend=used)
+                    inertia_list.append(inertia)
+                if early_stop and knee_is_clear(k_values[:len(inertia_list)], inertia_list):
+                    break
+    else:
+        centers = None
+        rng = np.random.default_rng(random_state)
+        for k in k_values:
+            # the inertia measures the sum of squared distances of samples to their closest
+            # cluster center. a smaller inertia is aimed for so that the center of the cluster
+            # is in the right position.
+            init = warm_start_centers(clustering, centers, k, rng) if warm_start else None
+            inertia, centers, n_iter, used = fit_inertia(clustering, k, random_state, init,
+                                                         backend, recorder)
+            recorder.event('kmeans', k=k, n_iter=n_iter, inertia=inertia,
+                           warm_start=init is not None, backend=used)
+            inertia_list.append(inertia)
+            if early_stop and knee_is_clear(k_values[:len(inertia_list)], inertia_list):
+                break
+
+    # kneed (and the scipy it pulls in) takes about a second to import, so it is only imported
+    # when the elbow is actually looked for.
+    from kneed import KneeLocator
 
     # the KneeLocator class locates the optimum number of clusters.
     # too little clusters cause some disjoint groups of data are forced to fit into one larger
     # cluster.
     # while too many clusters creates artificial boundaries within real data clusters.
-    knee_locator = KneeLocator(range(1, 10), inertia_list, curve="convex", direction="decreasing")
-
+    knee_locator = KneeLocator(k_values[:len(inertia_list)], inertia_list, curve="convex",
+                               direction="decreasing")
+
+    # a range with too few k values, or inertias that fall in a straight line, have no knee.
+    if knee_locator.elbow is None:
+        k = k_values[len(inertia_list) - 1]
+        warnings.warn(f'The inertias for k in {k_values} have no knee; using k = {k}, the '
+                      f'largest k tried')
+        return int(k)
     return int(knee_locator.elbow)
 
 
-def combine_datasets(property_prices: list[list],
-                     vaccine_trends: list[list],
-                     covid_cases: list[list],
-                     crime_rates: list[list],
-                     unemployment: list[list]) -> (list[list], list[list]):
-    """Return the combination of the information from 3 datasets as a single list of lists."""
-    temp_lst1 = []
-    temp_lst2 = []
-    covid_dataset = []
-    not_covid_dataset = []
-
-    for i in range(len(property_prices)):
-        if i != 0:
-            temp_lst1.append(property_prices[i][0])
-            temp_lst1.append(property_prices[i][1])
-            temp_lst1.append(average_house_price(property_prices, property_prices[i][1]))
-            temp_lst1.append(average_vaccination_rate(vaccine_trends, vaccine_trends[i][1]))
-            temp_lst1.append(average_covid_cases_rate(covid_cases, covid_cases[i][1]))
-            temp_lst1.append(average_unemployment_rate(unemployment, unemployment[i][1]))
-            temp_lst1.append(average_crime_rate(crime_rates, crime_rates[i][1]))
-
-            temp_lst2.append(property_prices[i][0])
-            temp_lst2.append(property_prices[i][1])
-            temp_lst2.append(average_house_price_pre_covid(property_prices, property_prices[i][1]))
-            temp_lst2.append(average_unemployment_rate(unemployment, unemployment[i][1]))
-            temp_lst2.append(average_crime_rate_pre_covid(crime_rates, crime_rates[i][1]))
-
-            covid_dataset.append(temp_lst1)
-            not_covid_dataset.append(temp_lst2)
-
-        temp_lst1 = []
-        temp_lst2 = []
+def fit_inertia(clustering: np.ndarray, k: int, random_state: int,
+                init: Optional[np.ndarray] = None, backend: Optional[str] = None,
+                recorder: Recorder = NULL_RECORDER) -> tuple[float, np.ndarray, int, str]:
+    """Return the inertia, the cluster centers, the number of iterations and the name of the
+    backend of a k-means model with k clusters fitted to clustering by the given backend, or by
+    BACKEND if backend is None.
+
+    If init is given, the model starts from those centers instead of k-means++. The name is
+    that of the backend that actually ran, so 'auto' is never returned.
+    """
+    if backend is None:
+        backend = BACKEND
+    kmean_model = backends.fit(clustering, k, random_state, init, backend, recorder)
+    return (kmean_model.inertia_, kmean_model.cluster_centers_, kmean_model.n_iter_,
+            kmean_model.backend)
+
+
+def warm_start_centers(clustering: np.ndarray, centers: Optional[np.ndarray], k: int,
+                       rng: np.random.Generator) -> Optional[np.ndarray]:
+    """Return the initial centers for a model with k clusters, made from the centers of the
+    model with k - 1 clusters and one new center.
+
+    The new center is picked the same way as in greedy k-means++: a few points are sampled
+    with probability proportional to their squared distance from the closest center, and the
+    one that lowers the inertia the most is kept. Return None if there is no model with
+    k - 1 clusters to start from.
+    """
+    if centers is None or len(centers) != k - 1:
+        return None
+
+    distances = ((clustering[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2).sum(axis=2)
+    closest = distances.min(axis=1)
+    if closest.sum() == 0:
+        return None
+
+    candidates = rng.choice(len(clustering), size=2 + int(np.log(k)), p=closest / closest.sum())
+    reductions = [np.maximum(closest - ((clustering - clustering[i]) ** 2).sum(axis=1), 0).sum()
+                  for i in candidates]
+    return np.vstack([centers, clustering[candidates[int(np.argmax(reductions))]]])
+
+
+def knee_is_clear(k_values: range, inertia_list: list[float], patience: int = 2,
+                  tolerance: float = 0.01) -> bool:
+    """Return whether the knee of the inertias seen so far is clear enough to stop trying
+    larger k values.
+
+    The knee is clear once it has not moved for the last patience k values and each of those
+    k values removed less than tolerance of the inertia of the first k value.
+    """
+    if len(inertia_list) < patience + 3:
+        return False
+
+    drops = -np.diff(inertia_list[-patience - 1:]) / inertia_list[0]
+    if np.any(drops >= tolerance):
+        return False
+
+    from kneed import KneeLocator
+
+    knees = set()
+    for end in range(len(inertia_list) - patience + 1, len(inertia_list) + 1):
+        knees.add(KneeLocator(k_values[:end], inertia_list[:end], curve="convex",
+                              direction="decreasing").elbow)
+    return len(knees) == 1 and None not in knees
+
+
+class JoinWarning(UserWarning):
+    """Warning raised when the datasets do not line up on their Neighbourhood IDs."""
+
+
+def as_table(data: Dataset, filename: str) -> ColumnarTable:
+    """Return data as a columnar table laid out like the data file with the given filename.
+
+    data may already be a columnar table, or a list of lists from convert_file whose first row
+    is the header.
+    """
+    if isinstance(data, ColumnarTable):
+        return data
+    return table_from_rows(data[1:], SCHEMAS[filename])
+
+
+def join_indexes(base: ColumnarTable, others: dict[str, ColumnarTable]) \
+        -> tuple[list[str], np.ndarray, dict[str, np.ndarray]]:
+    """Return the IDs shared by base and every dataset in others, along with the row of each
+    shared ID in base and in each of the others.
+
+    Any ID that is duplicated or missing from one of the datasets is reported with a
+    JoinWarning.
+    """
+    for name, index in [('property_prices', base)] + list(others.items()):
+        if index.duplicates:
+            warnings.warn(f'{name} has duplicated Neighbourhood IDs {index.duplicates}; '
+                          f'only the first row of each was used', JoinWarning)
+
+    keys = []
+    base_rows = []
+    other_rows = {name: [] for name in others}
+    missing = {name: [] for name in others}
+
+    for key, position in base.positions.items():
+        found = [(name, index.positions.get(key)) for name, index in others.items()]
+        absent = [name for name, row in found if row is None]
+        if absent:
+            for name in absent:
+                missing[name].append(key)
+            continue
+        keys.append(key)
+        base_rows.append(position)
+        for name, row in found:
+            other_rows[name].append(row)
+
+    for name, keys_missing in missing.items():
+        if keys_missing:
+            warnings.warn(f'{name} is missing Neighbourhood IDs {keys_missing}; '
+                          f'those neighbourhoods were left out', JoinWarning)
+
+    return (keys, np.array(base_rows, dtype=np.intp),
+            {name: np.array(rows, dtype=np.intp) for name, rows in other_rows.items()})
+
+
+def combine_datasets(property_prices: Dataset,
+                     vaccine_trends: Dataset,
+                     covid_cases: Dataset,
+                     crime_rates: Dataset,
+                     unemployment: Dataset) -> (list[list], list[list]):
+    """Return the combination of the information from 5 datasets as two lists of lists.
+
+    The first list of lists contains the covid data and the second one contains the data from
+    before covid. Each dataset may be a list of lists from convert_file or a columnar table
+    from load_table.
+    """
+    keys, names, covid_features, non_covid_features = join_features(
+        property_prices, vaccine_trends, covid_cases, crime_rates, unemployment)
+
+    covid_dataset = [[key, name] + features
+                     for key, name, features in zip(keys, names, covid_features.tolist())]
+    not_covid_dataset = [[key, name] + features
+                         for key, name, features in zip(keys, names, non_covid_features.tolist())]
+
     return covid_dataset, not_covid_dataset
 
 
+def join_features(property_prices: Dataset,
+                  vaccine_trends: Dataset,
+                  covid_cases: Dataset,
+                  crime_rates: Dataset,
+                  unemployment: Dataset) -> tuple[list[str], list[str], np.ndarray, np.ndarray]:
+    """Return the Neighbourhood IDs and names shared by the 5 datasets, along with the covid and
+    pre-covid feature matrices, which have one row per neighbourhood.
+
+    Each dataset is indexed on its Neighbourhood ID once, so every neighbourhood is matched in
+    constant time rather than by searching through the whole dataset.
+    """
+    prices = as_table(property_prices, 'property_prices.csv')
+    others = {'vaccine_trends': as_table(vaccine_trends, 'vaccine_trends.csv'),
+              'covid_cases': as_table(covid_cases, 'neighbourhood_cases.csv'),
+              'crime_rates': as_table(crime_rates, 'neighbourhood_crime_rates.csv'),
+              'unemployment': as_table(unemployment, 'neighbourhood_census.csv')}
+
+    keys, price_rows, rows = join_indexes(prices, others)
+
+    price = prices.values(['price_2021', 'price_2020', 'price_2018'])[price_rows]
+    vaccination = others['vaccine_trends'].columns['vaccination_rate'][rows['vaccine_trends']]
+    cases = others['covid_cases'].columns['case_rate'][rows['covid_cases']]
+    crime = others['crime_rates'].values(['crime_rate_2018',
+                                          'crime_rate_2020'])[rows['crime_rates']]
+    unemployment_rate = others['unemployment'].columns['unemployment_rate'][rows['unemployment']]
+
+    covid_features = np.column_stack([(price[:, 0] + price[:, 1]) / 2, vaccination, cases,
+                                      unemployment_rate, crime[:, 1]])
+    non_covid_features = np.column_stack([price[:, 2], unemployment_rate, crime[:, 0]])
+
+    names = [prices.names[row] for row in price_rows]
+    return keys, names, covid_features, non_covid_features
+
+
 def convert_to_dataframe(data: list[list]) -> pd.DataFrame:
     """Convert data into a dataframe using the Pandas library."""
 
@@ -156,11 +638,8 @@ def convert_to_dataframe(data: list[list]) -> pd.DataFrame:
 def cleanup_data(data1: pd.DataFrame, data2: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     """Return dataframes that have accurate columns."""
 
-    data1.columns = ['Neighbourhood ID', 'Neighbourhood Name', 'Avg Property Price',
-                     'Avg Vaccination Rate', 'Avg Covid Case Rate', 'Avg Unemployment Rate',
-                     'Avg Crime Rate']
-    data2.columns = ['Neighbourhood ID', 'Neighbourhood Name', 'Avg Property Price',
-                     'Avg Unemployment Rate', 'Avg Crime Rate']
+    data1.columns = COVID_COLUMNS
+    data2.columns = NON_COVID_COLUMNS
     return data1, data2
 
 
@@ -178,9 +657,12 @@ def convert_file(filename: str) -> list[list]:
         return data_so_far
 
 
-def average_covid_cases_rate(data: list[list], neighbourhood: str) -> float:
+def average_covid_cases_rate(data: Dataset, neighbourhood: str) -> float:
     """Return the average covid case rate of the given city from 2020 to 2021"""
 
+    if isinstance(data, ColumnarTable):
+        return table_average(data, neighbourhood, ['case_rate'])
+
     for i in range(len(data)):
         if data[i][1] == neighbourhood:
             case_rate = float(str.strip(data[i][2]))
@@ -188,9 +670,12 @@ def average_covid_cases_rate(data: list[list], neighbourhood: str) -> float:
     return 0.0
 
 
-def average_vaccination_rate(data: list[list], neighbourhood: str) -> float:
+def average_vaccination_rate(data: Dataset, neighbourhood: str) -> float:
     """Return the average vaccination rate of the given city from 2020 to 2021."""
 
+    if isinstance(data, ColumnarTable):
+        return table_average(data, neighbourhood, ['vaccination_rate'])
+
     for i in range(len(data)):
         if data[i][1] == neighbourhood:
             vax_rate = float((str.strip(data[i][4])))
@@ -198,9 +683,12 @@ def average_vaccination_rate(data: list[list], neighbourhood: str) -> float:
     return 0.0
 
 
-def average_house_price(data: list[list], neighbourhood: str) -> float:
+def average_house_price(data: Dataset, neighbourhood: str) -> float:
     """Return the average house price index of the given city from 2020 to 2021."""
 
+    if isinstance(data, ColumnarTable):
+        return table_average(data, neighbourhood, ['price_2021', 'price_2020'])
+
     # find the average house price index for each city from 2020 - 2021.
     for i in range(len(data)):
         if data[i][1] == neighbourhood:
@@ -209,9 +697,12 @@ def average_house_price(data: list[list], neighbourhood: str) -> float:
     return 0.0
 
 
-def average_house_price_pre_covid(data: list[list], neighbourhood: str) -> float:
+def average_house_price_pre_covid(data: Dataset, neighbourhood: str) -> float:
     """Return the average house price index of the given city from 2020 to 2021."""
 
+    if isinstance(data, ColumnarTable):
+        return table_average(data, neighbourhood, ['price_2018'])
+
     # find the average house price index for each city from 2020 - 2021.
     for i in range(len(data)):
         if data[i][1] == neighbourhood:
@@ -221,9 +712,12 @@ def average_house_price_pre_covid(data: list[list], neighbourhood: str) -> float
     return 0.0
 
 
-def average_unemployment_rate(data: list[list], neighbourhood: str) -> float:
+def average_unemployment_rate(data: Dataset, neighbourhood: str) -> float:
     """Return the average house price index of the given city from 2020 to 2021."""
 
+    if isinstance(data, ColumnarTable):
+        return table_average(data, neighbourhood, ['unemployment_rate'])
+
     # find the average house price index for each city from 2020 - 2021.
     for i in range(len(data)):
         if data[i][1] == neighbourhood:
@@ -232,9 +726,12 @@ def average_unemployment_rate(data: list[list], neighbourhood: str) -> float:
     return 0.0
 
 
-def average_crime_rate(data: list[list], neighbourhood: str) -> float:
+def average_crime_rate(data: Dataset, neighbourhood: str) -> float:
     """Return the average house price index of the given city from 2020 to 2021."""
 
+    if isinstance(data, ColumnarTable):
+        return table_average(data, neighbourhood, ['crime_rate_2020'])
+
     # find the average house price index for each city from 2020 - 2021.
     for i in range(len(data)):
         if data[i][1] == neighbourhood:
@@ -243,9 +740,12 @@ def average_crime_rate(data: list[list], neighbourhood: str) -> float:
     return 0.0
 
 
-def average_crime_rate_pre_covid(data: list[list], neighbourhood: str) -> float:
+def average_crime_rate_pre_covid(data: Dataset, neighbourhood: str) -> float:
     """Return the average house price index of the given city from 2018 to 2019."""
 
+    if isinstance(data, ColumnarTable):
+        return table_average(data, neighbourhood, ['crime_rate_2018'])
+
     # find the average house price index for each city from 2018 to 2019..
     for i in range(len(data)):
         if data[i][1] == neighbourhood:
@@ -254,12 +754,23 @@ def average_crime_rate_pre_covid(data: list[list], neighbourhood: str) -> float:
     return 0.0
 
 
+def table_average(data: ColumnarTable, neighbourhood: str, column_names: list[str]) -> float:
+    """Return the average of the given columns of the columnar table for the given
+    neighbourhood, or 0.0 if the neighbourhood is not in the table."""
+    row = data.name_positions.get(neighbourhood)
+    if row is None:
+        return 0.0
+    return float(sum(data.columns[name][row] for name in column_names) / len(column_names))
+
+
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['pandas', 'csv', 'sklearn.cluster', 'kneed'],
+        'extra-imports': ['pandas', 'numpy', 'csv', 'os', 'warnings', 'typing',
+                          'concurrent.futures', 'sklearn.cluster', 'kneed', 'backends',
+                          'cache', 'feature_cache', 'instrumentation', 'loader', 'neighbourhoods'],
         'allowed-io': ['convert_to_dataframe', 'convert_file'],
         'max-line-length': 100,
-        'disable': ['R1705', 'C0200']
+        'disable': ['R1705', 'C0200', 'C0415']
     })
@@ -17,153 +17,75 @@ This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumais
 
 # Import libraries
 import json
+import pandas as pd
 from plotly import graph_objects as go
 import cluster as c
+import geometry
+import figures
 
 
 def open_file(filename: json) -> json:
-    """Open the json file"""
-    with open(filename) as file:
-        reader = json.load(file)
-    return reader
-
-
-TORONTO_NEIGHBOURHOODS = open_file('neighbourhoods.geojson')
-
-# dataframe
-COVID_DATA, _ = c.main()
-
-# Initialize figure
-FIG = go.Figure()
-
-# Create figure object
-# Add Traces
-
-FIG.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        hovertext=COVID_DATA['Neighbourhood Name'],
-                        locations=COVID_DATA['Neighbourhood ID'],  # Assign location data,
-                        z=COVID_DATA['Cluster Labels'],  # Assign information data
-                        colorscale='Burg',
-                        colorbar={'title': 'Neighbourhood Desirability Index',
-                                  'tickmode': 'array',
-                                  'nticks': 3,
-                                  'tickvals': [0, 1, 2],
-                                  'ticktext': ['Least Desirable', 'Semi-Desirable',
-                                               'Most Desirable']},
-                        zauto=True,
-                        showscale=True
-
-                        ))
-
-
-FIG.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        locations=COVID_DATA['Neighbourhood ID'],  # Assign location data
-                        z=COVID_DATA['Avg Vaccination Rate'],  # Assign information data
-                        zauto=True,
-                        hovertext=COVID_DATA['Neighbourhood Name'],
-                        colorscale='viridis',
-                        colorbar={'title': 'Average Vaccination Rate (Percentage)'},
-                        showscale=True
-                        ))
-FIG.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        hovertext=COVID_DATA['Neighbourhood Name'],
-                        locations=COVID_DATA['Neighbourhood ID'],  # Assign location data,
-                        z=COVID_DATA['Avg Covid Case Rate'],  # Assign information data
-                        zauto=True,
-                        colorscale='Blues',
-                        colorbar={'title': 'Average Covid Case Rate (per 100,000 people)'},
-                        showscale=True
-                        ))
-
-FIG.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        hovertext=COVID_DATA['Neighbourhood Name'],
-                        locations=COVID_DATA['Neighbourhood ID'],  # Assign location data,
-                        z=COVID_DATA['Avg Unemployment Rate'],  # Assign information data
-                        zauto=True,
-                        colorscale='darkmint',
-                        colorbar={'title': 'Average Unemployment Rate (Percentage)'},
-                        showscale=True
-                        ))
-FIG.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        hovertext=COVID_DATA['Neighbourhood Name'],
-                        locations=COVID_DATA['Neighbourhood ID'],  # Assign location data,
-                        z=COVID_DATA['Avg Property Price'],  # Assign information data
-                        zauto=True,
-                        colorscale='tealrose',
-                        colorbar={'title': 'Average Property Price (in millions)'},
-                        showscale=True
-                        ))
-
-FIG.add_trace(
-    go.Choroplethmapbox(geojson=TORONTO_NEIGHBOURHOODS,  # Assign geojson file
-                        featureidkey='properties.AREA_SHORT_CODE',
-                        hovertext=COVID_DATA['Neighbourhood Name'],
-                        locations=COVID_DATA['Neighbourhood ID'],  # Assign location data,
-                        z=COVID_DATA['Avg Crime Rate'],  # Assign information data
-                        zauto=True,
-                        colorscale='Purpor',
-                        colorbar={'title': 'Average Crime Rate (per 100,000 people)'},
-                        showscale=True
-                        ))
-
-
-FIG.update_layout(
-    updatemenus=[
-        dict(
-            active=0,
-            buttons=list([
-                dict(label="Desirability Index",
-                     method="update",
-                     args=[{"visible": [True, False, False, False, False, False]},
-                           {"title": "Toronto Neighbourhoods Desirability Index"}]),
-                dict(label="Vaccination Rate",
-                     method="update",
-                     args=[{"visible": [False, True, False, False, False, False]},
-                           {"title": "Vaccination Completion in Toronto Neighbourhoods"}]),
-                dict(label="Covid-19 Rate",
-                     method="update",
-                     args=[{"visible": [False, False, True, False, False, False]},
-                           {"title": "Covid-19 in Toronto Neighbourhoods (per 100,000 people)"}]),
-                dict(label="Unemployment Rate",
-                     method="update",
-                     args=[{"visible": [False, False, False, True, False, False]},
-                           {"title": "Unemployment Rate in Toronto Neighbourhoods"}]),
-                dict(label="Property Prices",
-                     method="update",
-                     args=[{"visible": [False, False, False, False, True, False]},
-                           {"title": "Average Property Prices in Toronto Neighbourhood"}]),
-                dict(label="Crime Rate",
-                     method="update",
-                     args=[{"visible": [False, False, False, False, False, True]},
-                           {"title": "Crime Rate in Toronto Neighbourhoods"}]),
-            ]),
-        )
-    ])
-
-# Update layout
-FIG.update_layout(
-
-    mapbox_style="carto-positron",  # Decide a style for the map
-    mapbox_zoom=9,  # Zoom in scale
-    mapbox_center={"lat": 43.7, "lon": -79.4},  # Center location of the map
-)
+    """Open the json file
+
+    The file is only read once, no matter how many times it is opened.
+    """
+    return geometry.load_geojson(filename)
+
+
+def load_data() -> pd.DataFrame:
+    """Return the post-covid data, clustered."""
+    covid_data, _ = c.main()
+    return covid_data
+
+
+# The layers of the map, in the order of its menu.
+LAYERS = [
+    figures.Layer('desirability', 'Desirability Index',
+                  'Toronto Neighbourhoods Desirability Index', 'Cluster Labels', 'Burg',
+                  figures.DESIRABILITY_COLORBAR),
+    figures.Layer('vaccination', 'Vaccination Rate',
+                  'Vaccination Completion in Toronto Neighbourhoods', 'Avg Vaccination Rate',
+                  'viridis', {'title': 'Average Vaccination Rate (Percentage)'}),
+    figures.Layer('covid rate', 'Covid-19 Rate',
+                  'Covid-19 in Toronto Neighbourhoods (per 100,000 people)',
+                  'Avg Covid Case Rate', 'Blues',
+                  {'title': 'Average Covid Case Rate (per 100,000 people)'}),
+    figures.Layer('unemployment', 'Unemployment Rate',
+                  'Unemployment Rate in Toronto Neighbourhoods', 'Avg Unemployment Rate',
+                  'darkmint', {'title': 'Average Unemployment Rate (Percentage)'}),
+    figures.Layer('price', 'Property Prices', 'Average Property Prices in Toronto Neighbourhood',
+                  'Avg Property Price', 'tealrose',
+                  {'title': 'Average Property Price (in millions)'}),
+    figures.Layer('crime', 'Crime Rate', 'Crime Rate in Toronto Neighbourhoods',
+                  'Avg Crime Rate', 'Purpor', {'title': 'Average Crime Rate (per 100,000 people)'})
+]
+
+# The map of the post-covid data, which is only built when it is first asked for.
+COVID_MAP = figures.LazyFigure(load_data, LAYERS)
+
+
+def build_figure() -> go.Figure:
+    """Return the map of the post-covid data with every layer."""
+    return COVID_MAP.figure()
+
+
+def __getattr__(name: str) -> object:
+    """Return the module attributes that are computed the first time they are asked for:
+    TORONTO_NEIGHBOURHOODS, COVID_DATA and FIG."""
+    if name == 'TORONTO_NEIGHBOURHOODS':
+        return geometry.shared_geometry()
+    elif name == 'COVID_DATA':
+        return COVID_MAP.data()
+    elif name == 'FIG':
+        return COVID_MAP.figure()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['json', 'plotly', 'cluster'],
-        'allowed-io': ['open_file'],
+        'extra-imports': ['json', 'pandas', 'plotly', 'cluster', 'geometry', 'figures'],
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']
     })
@@ -0,0 +1,210 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the code that exports the pre-covid and covid maps as static html pages or
+plotly json files. Both maps share a single copy of the plotly.js bundle and of the
+neighbourhood geometry, and everything they need is written to the same folder, so the folder
+can be published as is.
+
+Run this file to export the maps:
+
+    python export.py --directory export --format html json
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+import plotly
+from plotly import graph_objects as go
+from plotly.offline import get_plotlyjs
+from plotly.utils import PlotlyJSONEncoder
+import cache
+import cluster as c
+import geometry
+import figures
+import covid_visualization as cv
+import before_covid_visualization as bcv
+
+# The folder that the maps are exported to by default.
+EXPORT_DIR = 'export'
+
+# The files shared by every exported map.
+PLOTLY_FILE = 'plotly.min.js'
+GEOMETRY_SCRIPT = 'neighbourhoods.js'
+GEOMETRY_FILE = 'neighbourhoods.geojson'
+
+# The source files that the exported maps depend on, besides the data files.
+SOURCE_FILES = c.SOURCE_FILES + [
+    os.path.join(os.path.dirname(__file__), filename)
+    for filename in ['geometry.py', 'figures.py', 'covid_visualization.py',
+                     'before_covid_visualization.py', 'export.py']]
+
+# The maps that are exported, by the name of their files, with their titles.
+MAPS = {'covid': (cv.COVID_MAP, 'Toronto Neighbourhoods During Covid'),
+        'before_covid': (bcv.NON_COVID_MAP, 'Toronto Neighbourhoods Before Covid')}
+
+# The page that shows one exported map. The traces are exported without their geometry, which
+# is loaded once from GEOMETRY_SCRIPT and given to every trace before plotting.
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{plotly_file}"></script>
+<script src="{geometry_script}"></script>
+</head>
+<body style="margin: 0">
+<div id="map" style="width: 100%; height: 100vh"></div>
+<script>
+var figure = {figure};
+figure.data.forEach(function (trace) {{ trace.geojson = NEIGHBOURHOODS; }});
+Plotly.newPlot('map', figure.data, figure.layout, {{responsive: true}});
+</script>
+</body>
+</html>
+"""
+
+
+@dataclass
+class ExportedFile:
+    """A file written, or left alone, by export_maps.
+
+    Instance Attributes:
+        - filename: the name of the file within the export folder
+        - size: the size of the file in bytes
+        - seconds: how long it took to write the file
+        - skipped: whether the file was already up to date and was not written again
+    """
+    filename: str
+    size: int
+    seconds: float
+    skipped: bool
+
+
+def export_maps(directory: str = EXPORT_DIR, formats: tuple[str, ...] = ('html',),
+                force: bool = False) -> list[ExportedFile]:
+    """Export the covid and pre-covid maps to directory in each of the given formats ('html'
+    and/or 'json') and return what was exported.
+
+    A file is only written again if force is True or one of the inputs it was made from has
+    changed since it was last exported.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    manifest = _read_manifest(manifest_path)
+    # each file is keyed on just the inputs it is made from, so that, for example, the shared
+    # files are not written again when only the data changes.
+    plotly_key = cache.cache_key([], {'plotly': plotly.__version__})
+    geometry_key = cache.cache_key(
+        [geometry.GEOJSON_FILE, os.path.join(os.path.dirname(__file__), 'geometry.py')],
+        {'tolerance': geometry.TOLERANCE, 'precision': geometry.PRECISION})
+    map_key = cache.cache_key(c.DATA_FILES + SOURCE_FILES,
+                              {'plotly': plotly.__version__, 'geometry': geometry_key})
+
+    outputs = {PLOTLY_FILE: (plotly_key, get_plotlyjs),
+               GEOMETRY_SCRIPT: (geometry_key,
+                                 lambda: 'var NEIGHBOURHOODS = ' + _geometry_json() + ';\n'),
+               GEOMETRY_FILE: (geometry_key, _geometry_json)}
+    for name, (lazy_figure, title) in MAPS.items():
+        if 'html' in formats:
+            outputs[name + '.html'] = (map_key, _html_writer(lazy_figure, title))
+        if 'json' in formats:
+            outputs[name + '.json'] = (map_key, _json_writer(lazy_figure, GEOMETRY_FILE))
+
+    exported = []
+    for filename, (key, make_contents) in outputs.items():
+        path = os.path.join(directory, filename)
+        if not force and manifest.get(filename) == key and os.path.exists(path):
+            exported.append(ExportedFile(filename, os.path.getsize(path), 0.0, True))
+            continue
+
+        start = time.perf_counter()
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(make_contents())
+        os.replace(path + '.tmp', path)
+        exported.append(ExportedFile(filename, os.path.getsize(path),
+                                     time.perf_counter() - start, False))
+        manifest[filename] = key
+
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return exported
+
+
+def figure_json(figure: go.Figure, geojson: Optional[str] = None) -> str:
+    """Return the figure as plotly json without the geometry of its traces.
+
+    If geojson is given, every trace refers to the geometry at that url instead, which
+    plotly.js loads once and shares between the traces.
+    """
+    figure_dict = figure.to_plotly_json()
+    data = []
+    for trace in figure_dict['data']:
+        trace = {key: value for key, value in trace.items() if key != 'geojson'}
+        if geojson is not None:
+            trace['geojson'] = geojson
+        data.append(trace)
+    return json.dumps({'data': data, 'layout': figure_dict['layout']}, cls=PlotlyJSONEncoder,
+                      separators=(',', ':'))
+
+
+def format_report(exported: list[ExportedFile], seconds: float) -> str:
+    """Return a summary of the exported files and of how long exporting took."""
+    lines = []
+    for file in exported:
+        status = 'up to date' if file.skipped else f'written in {file.seconds:.2f}s'
+        lines.append(f'{file.filename:<24} {file.size / 1024:>10.1f} KiB  {status}')
+    total = sum(file.size for file in exported)
+    lines.append(f'{"total":<24} {total / 1024:>10.1f} KiB  exported in {seconds:.2f}s')
+    return '\n'.join(lines)
+
+
+def _geometry_json() -> str:
+    """Return the shared neighbourhood geometry as compact json."""
+    return json.dumps(geometry.shared_geometry(), separators=(',', ':'))
+
+
+def _html_writer(lazy_figure: figures.LazyFigure, title: str) -> Callable[[], str]:
+    """Return a function that returns the html page of the given lazy map."""
+    return lambda: HTML_TEMPLATE.format(title=title, plotly_file=PLOTLY_FILE,
+                                        geometry_script=GEOMETRY_SCRIPT,
+                                        figure=figure_json(lazy_figure.figure()))
+
+
+def _json_writer(lazy_figure: figures.LazyFigure, geojson: str) -> Callable[[], str]:
+    """Return a function that returns the plotly json of the given lazy map."""
+    return lambda: figure_json(lazy_figure.figure(), geojson)
+
+
+def _read_manifest(path: str) -> dict:
+    """Return the manifest of a previous export, or an empty one if there is none."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the covid and pre-covid maps.')
+    parser.add_argument('--directory', default=EXPORT_DIR)
+    parser.add_argument('--format', nargs='+', choices=['html', 'json'], default=['html'])
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args()
+
+    export_start = time.perf_counter()
+    exported_files = export_maps(args.directory, tuple(args.format), args.force)
+    print(format_report(exported_files, time.perf_counter() - export_start))
@@ -0,0 +1,207 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the compiled cache of the joined covid and pre-covid feature matrices. The
+matrices are stored as .npy files that are memory-mapped when loaded, so later runs do not need
+to read the csv files at all.
+
+Run this file to rebuild, inspect or clear the cache:
+
+    python feature_cache.py build
+    python feature_cache.py info
+    python feature_cache.py clear
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import argparse
+import json
+import os
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import cache
+
+# The folder that the compiled feature matrices are written to.
+FEATURE_DIR = os.path.join(cache.CACHE_DIR, 'features')
+
+# The version of the layout of the folder, changed whenever the layout changes.
+FORMAT_VERSION = 1
+
+# The arrays stored in the folder.
+ARRAYS = ['ids', 'names', 'covid', 'non_covid']
+
+
+@dataclass
+class FeatureMatrices:
+    """The joined covid and pre-covid features of every neighbourhood.
+
+    Instance Attributes:
+        - ids: the Neighbourhood ID of each row
+        - names: the Neighbourhood Name of each row
+        - covid: the covid feature matrix, one row per neighbourhood
+        - non_covid: the pre-covid feature matrix, one row per neighbourhood
+
+    Representation Invariants:
+        - len(self.ids) == len(self.names) == len(self.covid) == len(self.non_covid)
+    """
+    ids: np.ndarray
+    names: np.ndarray
+    covid: np.ndarray
+    non_covid: np.ndarray
+
+
+def load(filenames: list[str], directory: str = FEATURE_DIR,
+         mmap: bool = True) -> Optional[FeatureMatrices]:
+    """Return the feature matrices compiled from the given files, or None if they have not
+    been compiled or any of the files has changed since.
+
+    If mmap is True, the arrays are memory-mapped instead of read into memory.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None or not is_fresh(manifest, filenames):
+        return None
+
+    mmap_mode = 'r' if mmap else None
+    try:
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+                  for name in ARRAYS}
+    except (OSError, ValueError):
+        return None
+    return FeatureMatrices(**arrays)
+
+
+def save(features: FeatureMatrices, filenames: list[str], directory: str = FEATURE_DIR) -> dict:
+    """Write the feature matrices compiled from the given files to directory and return the
+    manifest that describes them.
+
+    The manifest is written last, so a folder that was only partly written is never loaded.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    for name in ARRAYS:
+        array = np.ascontiguousarray(getattr(features, name))
+        path = os.path.join(directory, name + '.npy')
+        with open(path + '.tmp', 'wb') as file:
+            np.save(file, array)
+        os.replace(path + '.tmp', path)
+
+    manifest = {'version': FORMAT_VERSION,
+                'sources': {filename: source_stats(filename) for filename in filenames},
+                'rows': len(features.ids),
+                'arrays': {name: {'dtype': str(getattr(features, name).dtype),
+                                  'shape': list(getattr(features, name).shape)}
+                           for name in ARRAYS}}
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def read_manifest(directory: str = FEATURE_DIR) -> Optional[dict]:
+    """Return the manifest of the compiled feature matrices in directory, or None if there is
+    no usable one."""
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def is_fresh(manifest: dict, filenames: list[str]) -> bool:
+    """Return whether the feature matrices described by manifest were compiled from exactly
+    the given files, as they are now.
+
+    A file whose size and modification time are unchanged is assumed to be unchanged; any other
+    file is hashed and compared with its hash in the manifest.
+    """
+    sources = manifest['sources']
+    if sorted(sources) != sorted(filenames):
+        return False
+
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+        recorded = sources[filename]
+        if (stat.st_size, stat.st_mtime_ns) == (recorded['size'], recorded['mtime_ns']):
+            continue
+        if stat.st_size != recorded['size'] or \
+                cache.file_digest(filename) != recorded['sha256']:
+            return False
+    return True
+
+
+def source_stats(filename: str) -> dict:
+    """Return the size, modification time and hash of the given file."""
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': cache.file_digest(filename)}
+
+
+def describe(directory: str = FEATURE_DIR) -> str:
+    """Return a description of the compiled feature matrices in directory."""
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return f'There are no compiled feature matrices in {directory}.'
+
+    lines = [f'Compiled feature matrices in {directory} ({manifest["rows"]} neighbourhoods)']
+    for name, array in manifest['arrays'].items():
+        size = os.path.getsize(os.path.join(directory, name + '.npy'))
+        lines.append(f'  {name}: {array["dtype"]} {tuple(array["shape"])}, {size} bytes')
+    for filename, stats in manifest['sources'].items():
+        lines.append(f'  source {filename}: {stats["sha256"][:12]}')
+    fresh = is_fresh(manifest, list(manifest['sources']))
+    lines.append('  up to date' if fresh else '  out of date, one of the sources has changed')
+    return '\n'.join(lines)
+
+
+def clear(directory: str = FEATURE_DIR) -> None:
+    """Remove the compiled feature matrices in directory."""
+    for name in ARRAYS:
+        path = os.path.join(directory, name + '.npy')
+        if os.path.exists(path):
+            os.remove(path)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+
+def run_command(argv: Optional[list[str]] = None) -> None:
+    """Rebuild, inspect or clear the compiled feature matrices from the command line."""
+    parser = argparse.ArgumentParser(description='Manage the compiled feature matrices.')
+    parser.add_argument('command', choices=['build', 'info', 'clear'])
+    parser.add_argument('--directory', default=FEATURE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        # cluster imports this file, so it is only imported once it is needed.
+        import cluster
+        clear(args.directory)
+        cluster.load_features(directory=args.directory)
+        print(describe(args.directory))
+    elif args.command == 'info':
+        print(describe(args.directory))
+    else:
+        clear(args.directory)
+        print(f'Cleared the compiled feature matrices in {args.directory}.')
+
+
+if __name__ == '__main__':
+    run_command()
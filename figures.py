@@ -0,0 +1,360 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the code that builds the choropleth maps on demand. Nothing is computed until
+a map, or one of its layers, is asked for.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+from dataclasses import dataclass
+from typing import Callable, Optional
+import numpy as np
+import pandas as pd
+from plotly import graph_objects as go
+import geometry
+
+
+def desirability_colorbar(kclusters: int) -> dict:
+    """Return the colorbar of a desirability index layer with kclusters clusters, numbered from
+    0 for the least desirable up to kclusters - 1 for the most desirable."""
+    top = max(kclusters - 1, 1)
+    return {'title': 'Neighbourhood Desirability Index',
+            'tickmode': 'array',
+            'nticks': 3,
+            'tickvals': [0, top / 2, top],
+            'ticktext': ['Least Desirable', 'Semi-Desirable', 'Most Desirable']}
+
+
+# The colorbar of the desirability index layers. Its ticks are moved to fit the number of
+# clusters when the layer is built.
+DESIRABILITY_COLORBAR = desirability_colorbar(3)
+
+
+@dataclass(frozen=True)
+class Layer:
+    """One layer of a choropleth map, which can be selected from the map's menu.
+
+    Instance Attributes:
+        - name: the name we use to ask for the layer
+        - label: the label of the layer's button in the menu
+        - title: the title of the map while the layer is selected
+        - column: the column of the data that colours the neighbourhoods
+        - colorscale: the colorscale of the layer
+        - colorbar: the settings of the layer's colorbar
+    """
+    name: str
+    label: str
+    title: str
+    column: str
+    colorscale: str
+    colorbar: dict
+
+
+class LazyFigure:
+    """A choropleth map whose data, traces and figure are only built when they are first asked
+    for, and are then kept for later.
+
+    Instance Attributes:
+        - layers: the layers of the map, in the order of the menu
+    """
+    layers: list[Layer]
+
+    # Private Instance Attributes:
+    #   - _load_data: the function that returns the data of the map
+    #   - _load_geometry: the function that returns the geometry shared by the traces
+    #   - _data: the data of the map, or None if it has not been loaded yet
+    #   - _traces: the traces that have been built so far, by layer name
+    #   - _figure: the map with every layer, or None if it has not been built yet
+    _load_data: Callable[[], pd.DataFrame]
+    _load_geometry: Callable[[], dict]
+    _data: Optional[pd.DataFrame]
+    _traces: dict[str, go.Choroplethmapbox]
+    _figure: Optional[go.Figure]
+
+    def __init__(self, load_data: Callable[[], pd.DataFrame], layers: list[Layer],
+                 load_geometry: Callable[[], dict] = geometry.shared_geometry) -> None:
+        self.layers = layers
+        self._load_data = load_data
+        self._load_geometry = load_geometry
+        self._data = None
+        self._traces = {}
+        self._figure = None
+
+    def data(self) -> pd.DataFrame:
+        """Return the data of the map, loading it the first time it is asked for."""
+        if self._data is None:
+            self._data = self._load_data()
+        return self._data
+
+    def layer(self, name: str) -> Layer:
+        """Return the layer with the given name."""
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        raise KeyError(f'There is no layer named {name!r}')
+
+    def trace(self, name: str) -> go.Choroplethmapbox:
+        """Return the trace of the layer with the given name, building it the first time it is
+        asked for."""
+        if name not in self._traces:
+            layer = self.layer(name)
+            data = self.data()
+            colorbar = layer.colorbar
+            if layer.column == 'Cluster Labels':
+                colorbar = desirability_colorbar(int(data[layer.column].max()) + 1)
+            self._traces[name] = go.Choroplethmapbox(
+                geojson=self._load_geometry(),  # Assign geojson file
+                featureidkey='properties.AREA_SHORT_CODE',
+                hovertext=data['Neighbourhood Name'],
+                locations=data['Neighbourhood ID'],  # Assign location data
+                z=data[layer.column],  # Assign information data
+                colorscale=layer.colorscale,
+                colorbar=colorbar,
+                zauto=True,
+                showscale=True)
+        return self._traces[name]
+
+    def select(self, name: str) -> go.Figure:
+        """Return a map showing the layer with the given name.
+
+        Only the selected layer is built; layers that were selected before are kept in the menu
+        of the map, but layers that have never been selected are left out.
+        """
+        self.trace(name)
+        layers = [layer for layer in self.layers if layer.name in self._traces]
+        figure = _make_figure([self._traces[layer.name] for layer in layers], layers,
+                              [layer.name for layer in layers].index(name))
+        figure.update_layout(title=self.layer(name).title)
+        return figure
+
+    def figure(self) -> go.Figure:
+        """Return the map with every layer, building it the first time it is asked for."""
+        if self._figure is None:
+            self._figure = _make_figure([self.trace(layer.name) for layer in self.layers],
+                                        self.layers, 0)
+        return self._figure
+
+
+class AnimatedFigure:
+    """A choropleth map with a slider that steps through periods, built from the long table of
+    periods.run_periods.
+
+    The map has a single trace, which holds the geometry, the neighbourhoods and their names.
+    Each period of each layer is a frame that only holds the values of that period and the
+    colours of its layer, so a period adds just one value per neighbourhood to the map, and
+    every layer shares the one copy of the geometry. Frames are only built when the map is
+    first asked for, and are then kept for later.
+
+    Instance Attributes:
+        - layers: the layers the map can show; the column of each is a feature of the long
+          table or 'Cluster Labels'
+    """
+    layers: list[Layer]
+
+    # Private Instance Attributes:
+    #   - _load_result: the function that returns the long table of the map
+    #   - _load_geometry: the function that returns the geometry of the map
+    #   - _result: the long table, or None if it has not been loaded yet
+    #   - _values: the values of each layer that has been asked for, by layer name, with one
+    #     row per neighbourhood and one column per period
+    #   - _frames: the frames built so far, by period and layer name
+    #   - _figures: the maps built so far, by the name of the layer they first show
+    _load_result: Callable[[], pd.DataFrame]
+    _load_geometry: Callable[[], dict]
+    _result: Optional[pd.DataFrame]
+    _values: dict[str, pd.DataFrame]
+    _frames: dict[tuple[str, str], go.Frame]
+    _figures: dict[str, go.Figure]
+
+    def __init__(self, load_result: Callable[[], pd.DataFrame], layers: list[Layer],
+                 load_geometry: Callable[[], dict] = geometry.shared_geometry) -> None:
+        self.layers = layers
+        self._load_result = load_result
+        self._load_geometry = load_geometry
+        self._result = None
+        self._values = {}
+        self._frames = {}
+        self._figures = {}
+
+    def result(self) -> pd.DataFrame:
+        """Return the long table of the map, loading it the first time it is asked for."""
+        if self._result is None:
+            self._result = self._load_result()
+        return self._result
+
+    def periods(self) -> list[str]:
+        """Return the periods of the map, in the order of the long table."""
+        return list(dict.fromkeys(self.result()['period']))
+
+    def layer(self, name: str) -> Layer:
+        """Return the layer with the given name."""
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        raise KeyError(f'There is no layer named {name!r}')
+
+    def values(self, name: str) -> pd.DataFrame:
+        """Return the values of the layer with the given name, with one row for every
+        neighbourhood in the long table and one column per period. A neighbourhood that is
+        missing from a period has nan values in it."""
+        if name not in self._values:
+            result = self.result()
+            column = self.layer(name).column
+            if column == 'Cluster Labels':
+                rows = result.drop_duplicates(['period', 'Neighbourhood ID'])
+            else:
+                rows = result[result['feature'] == column]
+                column = 'value'
+            values = rows.pivot(index='Neighbourhood ID', columns='period', values=column)
+            self._values[name] = values.reindex(
+                index=list(dict.fromkeys(result['Neighbourhood ID'])),
+                columns=self.periods()).astype(float)
+        return self._values[name]
+
+    def frame(self, period: str, name: str) -> go.Frame:
+        """Return the frame of the given period of the layer with the given name, building it
+        the first time it is asked for.
+
+        The frame is named '<layer>/<period>'. Besides the values of the period, it holds the
+        colours, colour range and title of its layer, so the frames of every layer can share
+        one map.
+        """
+        if (period, name) not in self._frames:
+            self._frames[(period, name)] = go.Frame(
+                name=f'{name}/{period}', group=name, traces=[0],
+                data=[go.Choroplethmapbox(z=self.values(name)[period].to_numpy(),
+                                          **self._style(name))],
+                layout={'title': {'text': self.layer(name).title}})
+        return self._frames[(period, name)]
+
+    def figure(self, name: str = 'desirability') -> go.Figure:
+        """Return the animated map of every layer, showing the first period of the layer with
+        the given name, building it the first time it is asked for.
+
+        The map holds the frames of every period of every layer, so the geometry is written
+        out once no matter how many layers and periods there are. A menu moves to the first
+        period of a layer and the slider steps through the periods of every layer. Every period
+        of a layer is coloured on the same scale, so that the colours can be compared from one
+        period to the next.
+        """
+        if name not in self._figures:
+            values = self.values(name)
+            periods = self.periods()
+            result = self.result().drop_duplicates('Neighbourhood ID')
+            names = dict(zip(result['Neighbourhood ID'], result['Neighbourhood Name']))
+
+            trace = go.Choroplethmapbox(
+                geojson=self._load_geometry(),
+                featureidkey='properties.AREA_SHORT_CODE',
+                hovertext=[names[key] for key in values.index],
+                locations=list(values.index),
+                z=values[periods[0]].to_numpy(),
+                showscale=True,
+                **self._style(name))
+
+            frames = [self.frame(period, layer.name)
+                      for layer in self.layers for period in periods]
+            figure = go.Figure(data=[trace], frames=frames)
+            _add_slider(figure, [(frame.name, frame.name.split('/', 1)[1]) for frame in frames],
+                        f'{name}/{periods[0]}')
+            figure.update_layout(
+                title=self.layer(name).title,
+                mapbox_style="carto-positron",  # Decide a style for the map
+                mapbox_zoom=9,  # Zoom in scale
+                mapbox_center={"lat": 43.7, "lon": -79.4},  # Center location of the map
+            )
+            # the layer menu goes to the first period of the chosen layer.
+            buttons = [dict(label=layer.label, method='animate',
+                            args=[[f'{layer.name}/{periods[0]}'], _SHOW_FRAME])
+                       for layer in self.layers]
+            figure.update_layout(updatemenus=list(figure.layout.updatemenus) + [
+                dict(active=[layer.name for layer in self.layers].index(name),
+                     buttons=buttons)])
+            self._figures[name] = figure
+        return self._figures[name]
+
+    def _style(self, name: str) -> dict:
+        """Return the colours and colour range of the layer with the given name, which are the
+        same for every period of the layer."""
+        layer = self.layer(name)
+        values = self.values(name).to_numpy()
+        colorbar = layer.colorbar
+        if layer.column == 'Cluster Labels':
+            colorbar = desirability_colorbar(int(np.nanmax(values)) + 1)
+        return {'colorscale': layer.colorscale, 'colorbar': colorbar, 'zauto': False,
+                'zmin': float(np.nanmin(values)), 'zmax': float(np.nanmax(values))}
+
+
+# How a frame is shown when the slider or the layer menu moves to it. A choropleth has to be
+# redrawn to show the values of a new frame.
+_SHOW_FRAME = {'mode': 'immediate', 'frame': {'duration': 0, 'redraw': True},
+               'transition': {'duration': 0}}
+
+
+def _add_slider(figure: go.Figure, steps: list[tuple[str, str]], active: str) -> None:
+    """Add a slider with the given steps, each the name of a frame and its label, starting at
+    the frame named active, and buttons that play and pause the animation, to figure."""
+    # each step's value is the name of its frame, so that the slider follows the frame shown
+    # even when periods of different layers have the same label.
+    slider_steps = [dict(label=label, value=frame, method='animate',
+                         args=[[frame], _SHOW_FRAME])
+                    for frame, label in steps]
+    play = {'frame': {'duration': 800, 'redraw': True}, 'fromcurrent': True,
+            'transition': {'duration': 0}}
+    figure.update_layout(
+        sliders=[dict(active=[frame for frame, _ in steps].index(active), steps=slider_steps,
+                      currentvalue={'prefix': 'Period: '})],
+        updatemenus=[dict(type='buttons', direction='left', x=0.1, y=0, xanchor='right',
+                          yanchor='top',
+                          buttons=[dict(label='Play', method='animate', args=[None, play]),
+                                   dict(label='Pause', method='animate',
+                                        args=[[None], _SHOW_FRAME])])])
+
+
+def _make_figure(traces: list[go.Choroplethmapbox], layers: list[Layer], active: int) -> go.Figure:
+    """Return a map that shows the given traces, one for each of the given layers, and a menu
+    for choosing between them. The trace at index active is shown at first.
+
+    The map has a single trace, and the menu restyles it with the values, colours and colorbar
+    of the chosen layer, so the geometry is written out once however many layers there are.
+    """
+    figure = go.Figure(data=[traces[active]])
+
+    buttons = []
+    for trace, layer in zip(traces, layers):
+        # each restyled value is wrapped in a list, one item for each trace it is given to.
+        style = {'z': [list(trace.z)], 'colorscale': [trace.colorscale],
+                 'colorbar': [trace.colorbar.to_plotly_json()]}
+        buttons.append(dict(label=layer.label,
+                            method="update",
+                            args=[style, {"title": layer.title}]))
+
+    # Display Configurations
+    figure.update_layout(updatemenus=[dict(active=active, buttons=buttons)])
+
+    # Update layout
+    figure.update_layout(
+        mapbox_style="carto-positron",  # Decide a style for the map
+        mapbox_zoom=9,  # Zoom in scale
+        mapbox_center={"lat": 43.7, "lon": -79.4},  # Center location of the map
+    )
+    return figure
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['dataclasses', 'typing', 'numpy', 'pandas', 'plotly', 'geometry'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
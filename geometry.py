@@ -0,0 +1,245 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the code that loads the neighbourhood boundaries once and simplifies them into
+a smaller geometry that every map shares
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import functools
+import json
+import os
+from typing import Optional
+import numpy as np
+import cache
+
+# The file that contains the boundaries of the neighbourhoods.
+GEOJSON_FILE = 'neighbourhoods.geojson'
+
+# The folder that the simplified geometries are written to.
+GEOMETRY_DIR = os.path.join(cache.CACHE_DIR, 'geometry')
+
+# By default, boundaries are simplified to within about 10 metres and coordinates are rounded
+# to about 1 metre.
+TOLERANCE = 0.0001
+PRECISION = 5
+
+# The feature properties that the maps need; every other property is dropped.
+KEPT_PROPERTIES = ['AREA_SHORT_CODE', 'AREA_NAME']
+
+# A point, as a pair of rounded coordinates.
+Point = tuple[float, float]
+
+
+@functools.lru_cache(maxsize=None)
+def load_geojson(filename: str = GEOJSON_FILE) -> dict:
+    """Return the parsed geojson file.
+
+    The file is only read the first time it is asked for; afterwards the same object is
+    returned.
+    """
+    with open(filename) as file:
+        return json.load(file)
+
+
+@functools.lru_cache(maxsize=None)
+def shared_geometry(tolerance: Optional[float] = TOLERANCE, precision: int = PRECISION,
+                    filename: str = GEOJSON_FILE) -> dict:
+    """Return the simplified geometry of the neighbourhoods, which every map should use.
+
+    The same object is returned for the same arguments, so every trace refers to one geometry.
+    If tolerance is None, the boundaries are only rounded and not simplified. The simplified
+    geometry is cached on disk and is only recomputed when the geojson file or the arguments
+    change.
+    """
+    key = cache.cache_key([filename], {'tolerance': tolerance, 'precision': precision,
+                                       'properties': KEPT_PROPERTIES})
+    path = os.path.join(GEOMETRY_DIR, key + '.geojson')
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        pass
+
+    geometry = simplify_geojson(load_geojson(filename), tolerance, precision)
+
+    os.makedirs(GEOMETRY_DIR, exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(geometry, file, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+    return geometry
+
+
+def simplify_geojson(geojson: dict, tolerance: Optional[float], precision: int) -> dict:
+    """Return a copy of the geojson feature collection with its coordinates rounded to
+    precision decimal places and its boundaries simplified to within tolerance.
+
+    Boundaries shared by two neighbourhoods are simplified the same way for both, so no gaps or
+    overlaps open up between neighbourhoods. Only the properties in KEPT_PROPERTIES are kept.
+    """
+    features = geojson['features']
+    rings = [[_round_ring(ring, precision) for ring in polygon]
+             for feature in features for polygon in _polygons(feature['geometry'])]
+
+    if tolerance is not None:
+        junctions = find_junctions([ring for polygon in rings for ring in polygon])
+        simplified_arcs = {}
+        rings = [[simplify_ring(ring, junctions, tolerance, simplified_arcs) for ring in polygon]
+                 for polygon in rings]
+
+    simplified_features = []
+    polygon_iter = iter(rings)
+    for feature in features:
+        polygons = [next(polygon_iter) for _ in _polygons(feature['geometry'])]
+        if feature['geometry']['type'] == 'Polygon':
+            new_geometry = {'type': 'Polygon', 'coordinates': _as_lists(polygons[0])}
+        else:
+            new_geometry = {'type': 'MultiPolygon',
+                            'coordinates': [_as_lists(polygon) for polygon in polygons]}
+        simplified_features.append({
+            'type': 'Feature',
+            'properties': {name: feature['properties'].get(name) for name in KEPT_PROPERTIES},
+            'geometry': new_geometry})
+
+    return {'type': 'FeatureCollection', 'features': simplified_features}
+
+
+def find_junctions(rings: list[list[Point]]) -> set[Point]:
+    """Return the points where a boundary stops being shared by the same neighbourhoods.
+
+    A point is a junction if it has more than two distinct neighbouring points across all the
+    rings it is part of, which is where three or more neighbourhoods meet or where a shared
+    boundary ends.
+    """
+    neighbours = {}
+    for ring in rings:
+        # rings are closed, so the last point is the same as the first.
+        points = ring[:-1]
+        for i, point in enumerate(points):
+            adjacent = neighbours.setdefault(point, set())
+            adjacent.add(points[i - 1])
+            adjacent.add(points[(i + 1) % len(points)])
+    return {point for point, adjacent in neighbours.items() if len(adjacent) > 2}
+
+
+def simplify_ring(ring: list[Point], junctions: set[Point], tolerance: float,
+                  simplified_arcs: dict[tuple, list[Point]]) -> list[Point]:
+    """Return the closed ring simplified to within tolerance, without moving any junction.
+
+    The ring is split into arcs at its junctions and each arc is simplified on its own.
+    simplified_arcs remembers every arc that has been simplified, so that an arc shared with
+    another ring is simplified the same way for both. If simplifying would collapse the ring,
+    it is returned unchanged.
+    """
+    points = ring[:-1]
+    breaks = [i for i, point in enumerate(points) if point in junctions]
+    if not breaks:
+        breaks = [0]
+
+    # rotate the ring so it starts at a junction, then cut it into arcs at every junction.
+    start = breaks[0]
+    points = points[start:] + points[:start]
+    breaks = [i - start for i in breaks] + [len(points)]
+    points.append(points[0])
+
+    result = []
+    for begin, end in zip(breaks, breaks[1:]):
+        arc = tuple(points[begin:end + 1])
+        result.extend(_simplify_arc(arc, tolerance, simplified_arcs)[:-1])
+    result.append(result[0])
+
+    if len(result) < 4:
+        return ring
+    return result
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Return a mask of the points to keep so that the simplified line stays within tolerance
+    of every original point. The first and last points are always kept."""
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        segment = points[last] - points[first]
+        offsets = points[first + 1:last] - points[first]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+
+        furthest = int(np.argmax(distances))
+        if distances[furthest] > tolerance:
+            middle = first + 1 + furthest
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+
+    return keep
+
+
+def _simplify_arc(arc: tuple, tolerance: float,
+                  simplified_arcs: dict[tuple, list[Point]]) -> list[Point]:
+    """Return the arc simplified to within tolerance, in the same direction as arc.
+
+    Each arc is simplified in one canonical direction so that the same arc traversed backwards
+    by a neighbouring ring gives exactly the same points.
+    """
+    reverse = arc[::-1]
+    canonical = min(arc, reverse)
+    if canonical not in simplified_arcs:
+        keep = douglas_peucker(np.array(canonical), tolerance)
+        simplified_arcs[canonical] = [point for point, kept in zip(canonical, keep) if kept]
+
+    simplified = simplified_arcs[canonical]
+    return simplified if canonical == arc else simplified[::-1]
+
+
+def _polygons(geometry: dict) -> list[list]:
+    """Return the polygons of a Polygon or MultiPolygon geometry."""
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    return geometry['coordinates']
+
+
+def _round_ring(ring: list[list[float]], precision: int) -> list[Point]:
+    """Return the ring with each coordinate rounded to precision decimal places and with
+    repeated points removed."""
+    rounded = []
+    for x, y in ring:
+        point = (round(x, precision), round(y, precision))
+        if not rounded or rounded[-1] != point:
+            rounded.append(point)
+    if rounded[0] != rounded[-1]:
+        rounded.append(rounded[0])
+    return rounded
+
+
+def _as_lists(polygon: list[list[Point]]) -> list[list[list[float]]]:
+    """Return the rings of the polygon with each point as a list, as geojson expects."""
+    return [[list(point) for point in ring] for ring in polygon]
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['functools', 'json', 'os', 'typing', 'numpy', 'cache'],
+        'allowed-io': ['load_geojson', 'shared_geometry'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,265 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the incremental version of the clustering pipeline, for when new case counts
+or vaccination rates arrive and only a few rows of the data files change.
+
+Each run remembers a hash of every row of every data file, the joined feature matrices and the
+fitted cluster centers. The next run only re-joins the rows that changed, and then either just
+relabels those rows with the old centers (when few rows changed) or refits KMeans starting from
+the old centers. Either way, cluster i of the new run is the continuation of cluster i of the
+old one, so the labels stay consistent between runs.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import csv
+import hashlib
+import os
+import pickle
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import pandas as pd
+import cache
+import cluster as c
+from feature_cache import FeatureMatrices
+from instrumentation import NULL_RECORDER, Recorder
+from loader import SCHEMAS, table_from_rows
+
+# The file that the state of the last incremental run is kept in.
+STATE_FILE = os.path.join(cache.CACHE_DIR, 'incremental.pkl')
+
+# When at most this fraction of the rows changed, the changed rows are only relabelled with
+# the old cluster centers instead of refitting KMeans.
+REASSIGN_THRESHOLD = 0.05
+
+
+@dataclass
+class ClusterState:
+    """The clusters fitted to one of the feature matrices.
+
+    Instance Attributes:
+        - centers: the cluster centers, one row per cluster
+        - labels: the cluster of each neighbourhood, as numbered by KMeans
+    """
+    centers: np.ndarray
+    labels: np.ndarray
+
+
+@dataclass
+class RunState:
+    """What an incremental run remembers for the next one.
+
+    Instance Attributes:
+        - row_hashes: maps each data file to a map from each Neighbourhood ID to a hash of
+          its row
+        - features: the joined feature matrices
+        - covid: the clusters of the covid feature matrix
+        - non_covid: the clusters of the pre-covid feature matrix
+        - key: the state_key of the run, which changes with the clustering parameters and the
+          source files
+    """
+    row_hashes: dict[str, dict[str, bytes]]
+    features: FeatureMatrices
+    covid: ClusterState
+    non_covid: ClusterState
+    key: str
+
+
+def update(state_file: str = STATE_FILE, threshold: float = REASSIGN_THRESHOLD,
+           recorder: Recorder = NULL_RECORDER) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the post-covid and pre-covid dataframes, like cluster.main, updating the last
+    incremental run with only the rows that changed since.
+
+    If there is no last run, the clustering parameters or the source files changed since it
+    (see state_key), or neighbourhoods were added to or removed from any data file, the whole
+    pipeline is run instead. Otherwise the number of clusters of the last run is kept.
+    What was done is reported to recorder as an 'incremental' event.
+    """
+    with recorder.stage('read rows'):
+        rows = {filename: read_rows(filename) for filename in c.DATA_FILES}
+        row_hashes = {filename: {key: hash_row(row) for key, row in file_rows.items()}
+                      for filename, file_rows in rows.items()}
+
+    key = state_key()
+    state = load_state(state_file)
+    changed = changed_ids(state, row_hashes, key)
+
+    if changed is None:
+        recorder.event('incremental', mode='full', changed_rows=None)
+        with recorder.stage('full run'):
+            state = full_run(row_hashes, key, recorder)
+    elif changed:
+        with recorder.stage('update rows', rows=len(changed)):
+            features = update_features(state.features, rows, changed)
+        positions = np.flatnonzero(np.isin(features.ids, list(changed)))
+        reassign = len(changed) <= threshold * len(features.ids)
+        recorder.event('incremental', mode='reassign' if reassign else 'warm start',
+                       changed_rows=len(changed))
+        with recorder.stage('recluster'):
+            state = RunState(row_hashes, features,
+                             recluster(features.covid, state.covid, positions, reassign),
+                             recluster(features.non_covid, state.non_covid, positions,
+                                       reassign), key)
+    else:
+        recorder.event('incremental', mode='unchanged', changed_rows=0)
+
+    if changed is None or changed:
+        save_state(state, state_file)
+    return result_frames(state)
+
+
+def full_run(row_hashes: dict[str, dict[str, bytes]], key: str,
+             recorder: Recorder) -> RunState:
+    """Return the state of a run of the whole pipeline on the data files, with the given
+    state_key."""
+    features = c.load_features(recorder=recorder)
+    features = FeatureMatrices(np.array(features.ids), np.array(features.names),
+                               np.array(features.covid), np.array(features.non_covid))
+
+    clusters = []
+    for store in c.feature_stores(features):
+        kmeans = c.fit_kmeans(store.values(), c.elbow_method(store, recorder=recorder))
+        clusters.append(ClusterState(kmeans.cluster_centers_, kmeans.labels_))
+    return RunState(row_hashes, features, clusters[0], clusters[1], key)
+
+
+def state_key() -> str:
+    """Return a key that identifies the clustering parameters and the source files, like the
+    key of cluster.main but without the data files, whose changes are found row by row."""
+    return cache.cache_key(c.SOURCE_FILES + [__file__],
+                           {'k_values': list(c.K_VALUES), 'random_state': c.RANDOM_STATE,
+                            'backend': c.BACKEND})
+
+
+def changed_ids(state: Optional[RunState], row_hashes: dict[str, dict[str, bytes]],
+                key: str) -> Optional[set[str]]:
+    """Return the Neighbourhood IDs whose row changed in any data file since the run with the
+    given state, or None if the whole pipeline has to be run again because there was no such
+    run or its state_key is not key."""
+    # states saved before they had a key are run again too.
+    if state is None or getattr(state, 'key', None) != key \
+            or set(state.row_hashes) != set(row_hashes):
+        return None
+
+    changed = set()
+    for filename, hashes in row_hashes.items():
+        old_hashes = state.row_hashes[filename]
+        if hashes.keys() != old_hashes.keys():
+            return None
+        changed.update(key for key, row_hash in hashes.items() if old_hashes[key] != row_hash)
+
+    if not changed.issubset(state.features.ids):
+        return None
+    return changed
+
+
+def update_features(features: FeatureMatrices, rows: dict[str, dict[str, list[str]]],
+                    changed: set[str]) -> FeatureMatrices:
+    """Return a copy of the feature matrices with the rows of the changed Neighbourhood IDs
+    joined again from the given rows of each data file."""
+    keys = sorted(changed)
+    tables = {filename: table_from_rows([rows[filename][key] for key in keys], SCHEMAS[filename])
+              for filename in c.DATA_FILES}
+    new_keys, new_names, covid, non_covid = c.join_features(
+        tables['property_prices.csv'], tables['vaccine_trends.csv'],
+        tables['neighbourhood_cases.csv'], tables['neighbourhood_crime_rates.csv'],
+        tables['neighbourhood_census.csv'])
+
+    positions = {key: i for i, key in enumerate(features.ids.tolist())}
+    rows_to_update = [positions[key] for key in new_keys]
+
+    # the names are rebuilt rather than assigned into, since a new name may be longer than the
+    # fixed width of the old array.
+    names = features.names.tolist()
+    for row, name in zip(rows_to_update, new_names):
+        names[row] = name
+
+    updated = FeatureMatrices(features.ids.copy(), np.array(names, dtype=str),
+                              features.covid.copy(), features.non_covid.copy())
+    updated.covid[rows_to_update] = covid
+    updated.non_covid[rows_to_update] = non_covid
+    return updated
+
+
+def recluster(matrix: np.ndarray, clusters: ClusterState, positions: np.ndarray,
+              reassign: bool) -> ClusterState:
+    """Return the clusters of the updated feature matrix, given its clusters before the rows at
+    positions changed.
+
+    If reassign is True, only the changed rows are given the label of their closest old center.
+    Otherwise KMeans is refitted starting from the old centers. Either way, cluster i stays the
+    continuation of the old cluster i.
+    """
+    if reassign:
+        distances = ((matrix[positions, np.newaxis, :]
+                      - clusters.centers[np.newaxis, :, :]) ** 2).sum(axis=2)
+        labels = clusters.labels.copy()
+        labels[positions] = distances.argmin(axis=1)
+        return ClusterState(clusters.centers, labels)
+
+    kmeans = c.fit_kmeans(matrix, len(clusters.centers), init=clusters.centers)
+    return ClusterState(kmeans.cluster_centers_, kmeans.labels_)
+
+
+def result_frames(state: RunState) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the post-covid and pre-covid dataframes of the given run, like cluster.main."""
+    frames = []
+    for store, clusters in zip(c.feature_stores(state.features), [state.covid, state.non_covid]):
+        frames.append(store.frame(c.order_labels(clusters.labels, clusters.centers,
+                                                 list(store.columns),
+                                                 store.values().std(axis=0, ddof=1))))
+    return frames[0], frames[1]
+
+
+def read_rows(filename: str) -> dict[str, list[str]]:
+    """Return the rows of the data file, without its header, by Neighbourhood ID."""
+    id_column = SCHEMAS[filename].id_column
+    with open(filename, newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return {str.strip(row[id_column]): row for row in reader if row}
+
+
+def hash_row(row: list[str]) -> bytes:
+    """Return a short hash of the values in the row."""
+    return hashlib.blake2b('\x1f'.join(row).encode(), digest_size=8).digest()
+
+
+def load_state(state_file: str = STATE_FILE) -> Optional[RunState]:
+    """Return the state of the last incremental run, or None if there is none."""
+    try:
+        with open(state_file, 'rb') as file:
+            return pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def save_state(state: RunState, state_file: str = STATE_FILE) -> None:
+    """Remember the state of this run for the next one."""
+    os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+    with open(state_file + '.tmp', 'wb') as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(state_file + '.tmp', state_file)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['csv', 'hashlib', 'os', 'pickle', 'dataclasses', 'typing', 'numpy',
+                          'pandas', 'cache', 'cluster', 'feature_cache', 'instrumentation',
+                          'loader'],
+        'allowed-io': ['read_rows', 'load_state', 'save_state'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
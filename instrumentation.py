@@ -0,0 +1,171 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the recorders that the pipeline reports its stages to, so that we can see
+where the time goes in a run without attaching a profiler.
+
+A Recorder keeps every stage and event it is given and can pass each one on to a callback as it
+happens. NULL_RECORDER, which the pipeline uses by default, ignores everything and costs nothing.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import contextlib
+import time
+import tracemalloc
+from typing import Any, Callable, Iterator, Optional
+
+
+class Recorder:
+    """A recorder of the stages of a pipeline run and of the events inside them.
+
+    Every stage and event is recorded as a dictionary. A stage records its name, its depth
+    within other stages, its wall and cpu time in seconds, the peak number of bytes allocated
+    during it (if memory is traced) and any fields the stage adds. An event records its name,
+    the stage it happened in and its fields.
+
+    Instance Attributes:
+        - enabled: whether anything is recorded
+        - records: the stages and events recorded so far, in the order they finished
+    """
+    enabled: bool
+    records: list[dict]
+
+    # Private Instance Attributes:
+    #   - _callback: the function that is given each record as it is made, if any
+    #   - _trace_memory: whether the peak memory of each stage is measured
+    #   - _stack: the records of the stages that have started but not finished yet
+    _callback: Optional[Callable[[dict], None]]
+    _trace_memory: bool
+    _stack: list[dict]
+
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None,
+                 trace_memory: bool = False) -> None:
+        """Initialize a recorder that passes each record to callback, if it is given.
+
+        If trace_memory is True, tracemalloc measures the memory allocated by each stage,
+        which slows the stages down noticeably.
+        """
+        self.enabled = True
+        self.records = []
+        self._callback = callback
+        self._trace_memory = trace_memory
+        self._stack = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **fields: Any) -> Iterator[dict]:
+        """Record the stage run inside this context manager.
+
+        The record of the stage is yielded, so the stage can add fields to it, such as the
+        number of rows it processed.
+        """
+        record = {'type': 'stage', 'name': name, 'depth': len(self._stack), **fields}
+        started_tracing = self._trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self._trace_memory:
+            record['_start_bytes'] = tracemalloc.get_traced_memory()[0]
+            record['_child_peak'] = 0
+            tracemalloc.reset_peak()
+
+        self._stack.append(record)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall_start
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            self._stack.pop()
+
+            if self._trace_memory:
+                start_bytes = record.pop('_start_bytes')
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop('_child_peak'))
+                record['peak_bytes'] = peak - start_bytes
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent['_child_peak'] = max(parent['_child_peak'], peak)
+                if started_tracing:
+                    tracemalloc.stop()
+
+            self._record(record)
+
+    def event(self, name: str, **fields: Any) -> None:
+        """Record an event that happened in the current stage."""
+        stage = self._stack[-1]['name'] if self._stack else None
+        self._record({'type': 'event', 'name': name, 'stage': stage, **fields})
+
+    def stages(self) -> list[dict]:
+        """Return the records of the stages, in the order they finished."""
+        return [record for record in self.records if record['type'] == 'stage']
+
+    def events(self, name: Optional[str] = None) -> list[dict]:
+        """Return the records of the events with the given name, or of every event if name is
+        None."""
+        return [record for record in self.records
+                if record['type'] == 'event' and (name is None or record['name'] == name)]
+
+    def format_report(self) -> str:
+        """Return a table of the recorded stages, each indented by its depth."""
+        lines = [f'{"stage":<32} {"wall s":>9} {"cpu s":>9} {"peak MiB":>9}  details']
+        for record in self.stages():
+            peak = record.get('peak_bytes')
+            details = ', '.join(f'{key}={value}' for key, value in record.items()
+                                if key not in {'type', 'name', 'depth', 'wall_seconds',
+                                               'cpu_seconds', 'peak_bytes'})
+            lines.append(f'{"  " * record["depth"] + record["name"]:<32} '
+                         f'{record["wall_seconds"]:>9.4f} {record["cpu_seconds"]:>9.4f} '
+                         + (f'{peak / 2 ** 20:>9.2f}' if peak is not None else f'{"-":>9}')
+                         + f'  {details}')
+        return '\n'.join(lines)
+
+    def _record(self, record: dict) -> None:
+        """Keep record and pass it on to the callback."""
+        self.records.append(record)
+        if self._callback is not None:
+            self._callback(record)
+
+
+class NullRecorder(Recorder):
+    """A recorder that records nothing.
+
+    Its stage method returns a context manager that does nothing and its event method does
+    nothing, so code that reports to it pays almost nothing.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.enabled = False
+
+    def stage(self, name: str, **fields: Any) -> contextlib.nullcontext:
+        """Return a context manager that does nothing but yield a new, empty record.
+
+        Each stage gets a record of its own, so the fields a stage adds to it are thrown away
+        rather than shared with every other stage, on any thread.
+        """
+        return contextlib.nullcontext({})
+
+    def event(self, name: str, **fields: Any) -> None:
+        """Do nothing."""
+
+
+# The recorder used when no recorder is given.
+NULL_RECORDER = NullRecorder()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['contextlib', 'time', 'tracemalloc', 'typing'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,154 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the functions that load the csv files into columns of numbers, so that each
+value is only parsed once
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import csv
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Schema:
+    """The layout of a csv file with one row per neighbourhood.
+
+    Instance Attributes:
+        - id_column: the position of the Neighbourhood ID column
+        - name_column: the position of the Neighbourhood Name column
+        - numeric: maps the name we give each numeric column to its position
+    """
+    id_column: int
+    name_column: int
+    numeric: dict[str, int]
+
+
+@dataclass
+class ColumnarTable:
+    """A dataset stored as one array of floats per numeric column.
+
+    Instance Attributes:
+        - ids: the Neighbourhood ID of each row
+        - names: the Neighbourhood Name of each row
+        - columns: maps the name of each numeric column to its values, one per row
+        - positions: maps each Neighbourhood ID to the first row that has it
+        - name_positions: maps each Neighbourhood Name to the first row that has it
+        - duplicates: the Neighbourhood IDs that appeared in more than one row
+
+    Representation Invariants:
+        - len(self.ids) == len(self.names)
+        - all(len(values) == len(self.ids) for values in self.columns.values())
+    """
+    ids: list[str]
+    names: list[str]
+    columns: dict[str, np.ndarray]
+    positions: dict[str, int] = field(init=False)
+    name_positions: dict[str, int] = field(init=False)
+    duplicates: list[str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.positions = {}
+        self.duplicates = []
+        for row, key in enumerate(self.ids):
+            if key in self.positions:
+                self.duplicates.append(key)
+            else:
+                self.positions[key] = row
+
+        self.name_positions = {}
+        for row, name in enumerate(self.names):
+            self.name_positions.setdefault(name, row)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def values(self, column_names: list[str]) -> np.ndarray:
+        """Return the given columns side by side, one row per neighbourhood."""
+        return np.column_stack([self.columns[name] for name in column_names])
+
+
+# The layout of each of our data files.
+SCHEMAS = {
+    'neighbourhood_cases.csv': Schema(0, 1, {'case_rate': 2, 'case_count': 3}),
+    'neighbourhood_census.csv': Schema(0, 1, {'unemployment_rate': 2}),
+    'neighbourhood_crime_rates.csv': Schema(0, 1, {'crime_rate_2018': 2, 'crime_rate_2019': 3,
+                                                   'crime_rate_2020': 4}),
+    'property_prices.csv': Schema(0, 1, {'price_2021': 2, 'price_2020': 3, 'price_2018': 4}),
+    'vaccine_trends.csv': Schema(0, 1, {'population': 2, 'vaccinated': 3,
+                                        'vaccination_rate': 4})
+}
+
+
+def load_table(filename: str, schema: Schema) -> ColumnarTable:
+    """Return the csv file with the given schema as a columnar table.
+
+    The first row of the file is the header and is skipped.
+    """
+    with open(filename, newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return table_from_rows(reader, schema)
+
+
+def read_chunks(filename: str, schema: Schema, chunk_size: int) -> Iterator[ColumnarTable]:
+    """Yield the csv file with the given schema as columnar tables of chunk_size rows each
+    (the last may be smaller).
+
+    Only one chunk of the file is held in memory at a time.
+    """
+    with open(filename, newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield table_from_rows(chunk, schema)
+                chunk = []
+        if chunk:
+            yield table_from_rows(chunk, schema)
+
+
+def table_from_rows(rows: Iterable[list], schema: Schema) -> ColumnarTable:
+    """Return the given rows of strings, without a header, as a columnar table."""
+    ids = []
+    names = []
+    numeric = {name: array('d') for name in schema.numeric}
+
+    for row in rows:
+        if not row:
+            continue
+        ids.append(str.strip(row[schema.id_column]))
+        names.append(row[schema.name_column])
+        for name, column in schema.numeric.items():
+            numeric[name].append(float(row[column]))
+
+    # np.frombuffer shares the memory of each array instead of copying it.
+    columns = {name: np.frombuffer(values, dtype=float) if values else np.empty(0)
+               for name, values in numeric.items()}
+    return ColumnarTable(ids, names, columns)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['csv', 'array', 'dataclasses', 'typing', 'numpy'],
+        'allowed-io': ['load_table', 'read_chunks'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -2,6 +2,15 @@
 
 The main file that run, will display the choropleth maps that visualize our data
 
+The maps are shown from the prebuilt bundle (see bundle.py) whenever it is up to date with the
+data and source files, which only takes the standard library; otherwise the bundle is built
+first. Each map opens in the web browser.
+
+    python main.py [--rebuild] [--live] [--report]
+
+--live builds the maps with plotly and shows them without the bundle, and --report prints how
+long each stage of starting up took.
+
 Copyright and Usage Information
 ===============================
 
@@ -13,10 +22,58 @@ please consult TA rules.
 
 This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
 """
+# Import libraries
+import argparse
+from instrumentation import NULL_RECORDER, Recorder
+
+
+def show_maps(rebuild: bool = False, live: bool = False,
+              recorder: Recorder = NULL_RECORDER) -> None:
+    """Show the covid and pre-covid maps, reporting each stage of starting up to recorder.
+
+    If rebuild is True, the bundle is built again even if it is up to date. If live is True,
+    the maps are built with plotly instead of being taken from the bundle.
+    """
+    if live:
+        with recorder.stage('import'):
+            import covid_visualization as cv
+            import before_covid_visualization as bcv
+        # Each map is only built once it is about to be shown.
+        with recorder.stage('show covid'):
+            cv.build_figure().show()
+        with recorder.stage('show before covid'):
+            bcv.build_figure().show()
+        return
+
+    with recorder.stage('import'):
+        import pathlib
+        import webbrowser
+        import bundle
+
+    with recorder.stage('check bundle') as record:
+        manifest = None if rebuild else bundle.load_manifest()
+        record['up_to_date'] = manifest is not None
+    if manifest is None:
+        with recorder.stage('build bundle'):
+            manifest = bundle.build_bundle(force=rebuild, recorder=recorder)
+
+    with recorder.stage('open maps'):
+        for path in bundle.page_paths(manifest):
+            webbrowser.open(pathlib.Path(path).as_uri())
 
-import covid_visualization as cv
-import before_covid_visualization as bcv
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show the covid and pre-covid maps.')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='build the bundle again even if it is up to date')
+    parser.add_argument('--live', action='store_true',
+                        help='build the maps with plotly instead of showing the bundle')
+    parser.add_argument('--report', action='store_true',
+                        help='print how long each stage of starting up took')
+    args = parser.parse_args()
 
-cv.FIG.show()
-bcv.FIG1.show()
+    startup_recorder = Recorder() if args.report else NULL_RECORDER
+    with startup_recorder.stage('startup'):
+        show_maps(args.rebuild, args.live, startup_recorder)
+    if args.report:
+        print(startup_recorder.format_report())
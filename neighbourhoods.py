@@ -0,0 +1,104 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the compact store of the joined neighbourhood data that the pipeline
+clusters.
+
+The store keeps the numbers of every neighbourhood side by side in one contiguous array, which
+is handed to KMeans as it is, and only builds a dataframe when one is asked for.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import sys
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+
+
+class NeighbourhoodStore:
+    """The joined data of a set of neighbourhoods.
+
+    Each Neighbourhood ID and name is interned, so that equal strings are stored once, and the
+    numeric columns are held in one contiguous, read-only array of floats with one row per
+    neighbourhood.
+
+    Instance Attributes:
+        - ids: the Neighbourhood ID of each neighbourhood
+        - names: the Neighbourhood Name of each neighbourhood
+        - columns: the names of the numeric columns
+
+    Representation Invariants:
+        - len(self.ids) == len(self.names)
+    """
+    __slots__ = ('ids', 'names', 'columns', '_values', '_positions')
+    ids: tuple[str, ...]
+    names: tuple[str, ...]
+    columns: tuple[str, ...]
+
+    # Private Instance Attributes:
+    #   - _values: the numeric columns, one row per neighbourhood and one column per name in
+    #     columns
+    #   - _positions: maps each column name to its position in _values
+    _values: np.ndarray
+    _positions: dict[str, int]
+
+    def __init__(self, ids: Iterable[str], names: Iterable[str], columns: Iterable[str],
+                 values: np.ndarray) -> None:
+        """Initialize a store of the given neighbourhoods and their values.
+
+        values is only copied if it is not already a contiguous array of floats, so a store
+        made from a memory-mapped feature matrix reads straight from the mapped file.
+        """
+        self.ids = tuple(sys.intern(str(key)) for key in ids)
+        self.names = tuple(sys.intern(str(name)) for name in names)
+        self.columns = tuple(columns)
+        self._values = np.ascontiguousarray(values, dtype=float).view()
+        self._values.flags.writeable = False
+        self._positions = {column: i for i, column in enumerate(self.columns)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def values(self) -> np.ndarray:
+        """Return the numeric columns side by side, one row per neighbourhood.
+
+        The array is a read-only view of the store, not a copy.
+        """
+        return self._values
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the numeric column with the given name, as a read-only view of the store."""
+        return self._values[:, self._positions[name]]
+
+    def frame(self, labels: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Return the store as a dataframe with the Neighbourhood ID and name followed by the
+        numeric columns, and the cluster labels first if they are given.
+
+        The numeric columns of the dataframe are copied from the store, so that the dataframe
+        can be changed without changing the store.
+        """
+        frame = pd.DataFrame(self._values, columns=list(self.columns), copy=True)
+        frame.insert(0, 'Neighbourhood Name', list(self.names))
+        frame.insert(0, 'Neighbourhood ID', list(self.ids))
+        if labels is not None:
+            frame.insert(0, 'Cluster Labels', labels)
+        return frame
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['sys', 'typing', 'numpy', 'pandas'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,225 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the period-aware version of the pipeline, which clusters the neighbourhoods
+once for each of any number of periods, such as every month since 2015, instead of only during
+and before covid.
+
+Each period says which columns of which data files each of its features is the mean of. The
+data files are joined once, the features of every period are computed together in one matrix
+product, and the periods are then clustered in parallel.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import pandas as pd
+import cache
+import cluster as c
+from loader import SCHEMAS, ColumnarTable, load_table
+from neighbourhoods import NeighbourhoodStore
+
+# A column of a data file, as the name of the file and the name of the column in its schema.
+Source = tuple[str, str]
+
+
+@dataclass(frozen=True)
+class Period:
+    """One period that the neighbourhoods are clustered for.
+
+    Instance Attributes:
+        - name: the name of the period, such as 'covid' or '2021-03'
+        - features: maps the name of each feature of the period to the columns it is the mean
+          of, in the order the features are clustered on
+    """
+    name: str
+    features: dict[str, list[Source]]
+
+
+# The two periods of the original pipeline, which give the same data as cluster.main.
+COVID = Period('covid', {
+    'Avg Property Price': [('property_prices.csv', 'price_2021'),
+                           ('property_prices.csv', 'price_2020')],
+    'Avg Vaccination Rate': [('vaccine_trends.csv', 'vaccination_rate')],
+    'Avg Covid Case Rate': [('neighbourhood_cases.csv', 'case_rate')],
+    'Avg Unemployment Rate': [('neighbourhood_census.csv', 'unemployment_rate')],
+    'Avg Crime Rate': [('neighbourhood_crime_rates.csv', 'crime_rate_2020')]})
+PRE_COVID = Period('pre-covid', {
+    'Avg Property Price': [('property_prices.csv', 'price_2018')],
+    'Avg Unemployment Rate': [('neighbourhood_census.csv', 'unemployment_rate')],
+    'Avg Crime Rate': [('neighbourhood_crime_rates.csv', 'crime_rate_2018')]})
+PERIODS = [COVID, PRE_COVID]
+
+
+@dataclass
+class PeriodFeatures:
+    """The joined features of every period.
+
+    Instance Attributes:
+        - ids: the Neighbourhood ID of each row
+        - names: the Neighbourhood Name of each row
+        - matrices: maps the name of each period to its feature matrix, with one row per
+          neighbourhood and one column per feature. A row is nan where a neighbourhood is
+          missing a value that the period needs.
+    """
+    ids: list[str]
+    names: list[str]
+    matrices: dict[str, np.ndarray]
+
+
+def run_periods(periods: list[Period] = PERIODS,
+                tables: Optional[dict[str, ColumnarTable]] = None,
+                base: str = 'property_prices.csv',
+                max_workers: Optional[int] = None) -> pd.DataFrame:
+    """Return the clusters of the neighbourhoods in each of the given periods, as a long table.
+
+    tables maps the name of each data file to its columnar table, and defaults to the data
+    files loaded with their schemas. The neighbourhoods and their names are those of the base
+    table that are in every other table. In each period, the neighbourhoods missing any of its
+    values are left out, the number of clusters is picked with the elbow method and the
+    clusters are numbered in the order of the desirability index. The periods are clustered
+    on max_workers threads.
+
+    The table has one row for each period, neighbourhood and feature, with the columns
+    'period', 'Neighbourhood ID', 'Neighbourhood Name', 'Cluster Labels', 'feature' and
+    'value'. period_frame turns one period of it back into a dataframe like cluster.main's.
+    """
+    if tables is None:
+        tables = {filename: load_table(filename, SCHEMAS[filename])
+                  for filename in dict.fromkeys([base] + _filenames(periods))}
+    features = period_features(periods, tables, base)
+
+    if max_workers is None:
+        max_workers = min(len(periods), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda period: _cluster_period(period, features),
+                                    periods))
+    return pd.concat(results, ignore_index=True)
+
+
+def load_periods(periods: list[Period] = PERIODS) -> pd.DataFrame:
+    """Return the long table of run_periods for the given periods of the data files.
+
+    Like cluster.main, the result is cached for the rest of the session and on disk, and is
+    only recomputed when the data files, the periods, the clustering backend or the
+    source files change.
+    """
+    key = cache.cache_key(c.DATA_FILES + c.SOURCE_FILES + [__file__],
+                          {'periods': [[period.name, period.features] for period in periods],
+                           'k_values': list(c.K_VALUES), 'random_state': c.RANDOM_STATE,
+                           'backend': c.BACKEND})
+    result = cache.load(key)
+    if result is None:
+        result = run_periods(periods)
+        cache.store(key, result)
+    # Copy the cached table so that callers cannot change the cached result.
+    return result.copy()
+
+
+def period_features(periods: list[Period], tables: dict[str, ColumnarTable],
+                    base: str = 'property_prices.csv') -> PeriodFeatures:
+    """Return the feature matrices of the given periods, computed from tables joined on their
+    Neighbourhood IDs (see run_periods).
+
+    Every column that any period uses is gathered once, and each feature of each period is a
+    column of a single matrix product of those columns with the weights of their means.
+    """
+    keys, base_rows, rows = c.join_indexes(tables[base], {filename: tables[filename]
+                                                          for filename in _filenames(periods)
+                                                          if filename != base})
+    rows[base] = base_rows
+
+    sources = list(dict.fromkeys(source for period in periods
+                                 for columns in period.features.values() for source in columns))
+    positions = {source: i for i, source in enumerate(sources)}
+    gathered = np.column_stack([tables[filename].columns[column][rows[filename]]
+                                for filename, column in sources])
+
+    # each feature is a column of weights that averages the columns it is the mean of.
+    weights = np.zeros((len(sources), sum(len(period.features) for period in periods)))
+    feature = 0
+    for period in periods:
+        for columns in period.features.values():
+            for source in columns:
+                weights[positions[source], feature] += 1 / len(columns)
+            feature += 1
+
+    # a missing value would spoil every product it is in, so missing values are counted
+    # separately and only the features that need them are made nan.
+    missing = np.isnan(gathered)
+    all_features = np.nan_to_num(gathered) @ weights
+    all_features[(missing @ (weights > 0)) > 0] = np.nan
+
+    matrices = {}
+    start = 0
+    for period in periods:
+        matrices[period.name] = all_features[:, start:start + len(period.features)]
+        start += len(period.features)
+    names = [tables[base].names[row] for row in base_rows]
+    return PeriodFeatures(keys, names, matrices)
+
+
+def period_frame(result: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Return one period of the long table from run_periods as a dataframe with one row per
+    neighbourhood, laid out like the dataframes of cluster.main."""
+    rows = result[result['period'] == period]
+    frame = rows.pivot(index=['Cluster Labels', 'Neighbourhood ID', 'Neighbourhood Name'],
+                       columns='feature', values='value')
+    frame = frame[list(dict.fromkeys(rows['feature']))]
+    order = list(dict.fromkeys(rows['Neighbourhood ID']))
+    frame = frame.reset_index().set_index('Neighbourhood ID', drop=False).loc[order]
+    frame.columns.name = None
+    return frame.reset_index(drop=True)
+
+
+def _cluster_period(period: Period, features: PeriodFeatures) -> pd.DataFrame:
+    """Return the long table of the clusters of the neighbourhoods in the given period."""
+    matrix = features.matrices[period.name]
+    complete = ~np.isnan(matrix).any(axis=1)
+    matrix = matrix[complete]
+    ids = [key for key, keep in zip(features.ids, complete) if keep]
+    names = [name for name, keep in zip(features.names, complete) if keep]
+    columns = list(period.features)
+
+    kmeans = c.fit_kmeans(matrix, c.elbow_method(NeighbourhoodStore(ids, names, columns,
+                                                                    matrix)))
+    labels = c.order_labels(kmeans.labels_, kmeans.cluster_centers_, columns,
+                            matrix.std(axis=0, ddof=1))
+
+    # the long table repeats each neighbourhood once per feature, feature by feature.
+    return pd.DataFrame({'period': period.name,
+                         'Neighbourhood ID': np.repeat(ids, len(columns)),
+                         'Neighbourhood Name': np.repeat(names, len(columns)),
+                         'Cluster Labels': np.repeat(labels, len(columns)),
+                         'feature': np.tile(columns, len(ids)),
+                         'value': matrix.ravel()})
+
+
+def _filenames(periods: list[Period]) -> list[str]:
+    """Return the data files that the given periods use, in the order they are first used."""
+    return list(dict.fromkeys(filename for period in periods
+                              for columns in period.features.values()
+                              for filename, _ in columns))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'concurrent.futures', 'dataclasses', 'typing', 'numpy',
+                          'pandas', 'cache', 'cluster', 'loader', 'neighbourhoods'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,208 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the code that reduces raw records, such as individual property sales or
+reported crimes, to the per-neighbourhood values that our data files hold.
+
+The record files can be far larger than memory, so each one is read a chunk at a time and only
+the running total and count of every neighbourhood and year are kept. The files are read in
+parallel, and their totals are added together at the end.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import pandas as pd
+import spatial_index
+from loader import SCHEMAS, ColumnarTable
+
+# The number of records read from a file at a time.
+CHUNK_SIZE = 1000000
+
+# Crime rates are the number of crimes per this many people.
+RATE_POPULATION = 100000
+
+
+@dataclass(frozen=True)
+class RecordFormat:
+    """The layout of a csv file of raw records, with a header and one row per record.
+
+    Instance Attributes:
+        - date_column: the column with the date of each record, which starts with its year,
+          such as 2021-03-14, or is just the year
+        - value_column: the column with the value to average, such as the price of a sale, or
+          None if the records are only counted
+        - id_column: the column with the Neighbourhood ID of each record, or None if records
+          are placed in their neighbourhood by their location
+        - longitude_column: the column with the longitude of each record
+        - latitude_column: the column with the latitude of each record
+    """
+    date_column: str
+    value_column: Optional[str] = None
+    id_column: Optional[str] = None
+    longitude_column: str = 'longitude'
+    latitude_column: str = 'latitude'
+
+
+# The layout of a file of property sales and of a file of reported crimes.
+SALES_FORMAT = RecordFormat('date', value_column='price')
+INCIDENTS_FORMAT = RecordFormat('date')
+
+
+def aggregate_records(filenames: list[str], record_format: RecordFormat,
+                      chunk_size: int = CHUNK_SIZE,
+                      max_workers: Optional[int] = None) -> pd.DataFrame:
+    """Return the mean value and number of the records in the given files for each
+    neighbourhood and year.
+
+    The result has the columns 'Neighbourhood ID', 'period', 'mean' and 'count', with one row
+    for each neighbourhood and year that has any records. Records without a neighbourhood, a
+    year or (if the records have values) a value are left out. The files are read on a pool of
+    max_workers processes, chunk_size records at a time.
+    """
+    if len(filenames) == 1 or max_workers == 1:
+        totals = [aggregate_file(filename, record_format, chunk_size) for filename in filenames]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            totals = list(executor.map(aggregate_file, filenames,
+                                       [record_format] * len(filenames),
+                                       [chunk_size] * len(filenames)))
+
+    total = _add_totals(totals)
+    result = total.reset_index()
+    result.insert(2, 'mean', result['total'] / result['count'])
+    return result.drop(columns='total').rename(columns={'neighbourhood': 'Neighbourhood ID'})
+
+
+def aggregate_file(filename: str, record_format: RecordFormat,
+                   chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """Return the total value and number of the records in the file for each neighbourhood and
+    year, indexed by neighbourhood and year.
+
+    Only one chunk of chunk_size records is in memory at a time.
+    """
+    columns = [record_format.date_column]
+    if record_format.value_column is not None:
+        columns.append(record_format.value_column)
+    if record_format.id_column is not None:
+        columns.append(record_format.id_column)
+    else:
+        columns.extend([record_format.longitude_column, record_format.latitude_column])
+
+    total = _add_totals([])
+    for chunk in pd.read_csv(filename, usecols=columns, chunksize=chunk_size, dtype=str):
+        total = _add_totals([total, _aggregate_chunk(chunk, record_format)])
+    return total
+
+
+def property_price_table(sales: pd.DataFrame,
+                         names: Optional[dict[str, str]] = None) -> ColumnarTable:
+    """Return the mean sale prices in sales, from aggregate_records, as a table laid out like
+    property_prices.csv.
+
+    names maps each Neighbourhood ID to its name, and defaults to the names in the geojson
+    file. A neighbourhood with no sales in a year has a nan price for that year.
+    """
+    return _period_table(sales, 'property_prices.csv', 'mean', names)
+
+
+def crime_rate_table(incidents: pd.DataFrame, population: ColumnarTable,
+                     names: Optional[dict[str, str]] = None) -> ColumnarTable:
+    """Return the number of crimes in incidents, from aggregate_records, per RATE_POPULATION
+    people as a table laid out like neighbourhood_crime_rates.csv.
+
+    population is a table with a 'population' column, such as vaccine_trends.csv loaded by
+    loader.load_table, and the table has a row for every neighbourhood in it. names is as in
+    property_price_table. A neighbourhood with no crimes in a year has a crime rate of 0 for
+    that year.
+    """
+    table = _period_table(incidents, 'neighbourhood_crime_rates.csv', 'count', names,
+                          population.ids)
+    people = np.array([population.columns['population'][population.positions[key]]
+                       if key in population.positions else np.nan for key in table.ids])
+    for name, counts in table.columns.items():
+        table.columns[name] = np.nan_to_num(counts) / people * RATE_POPULATION
+    return table
+
+
+def _aggregate_chunk(chunk: pd.DataFrame, record_format: RecordFormat) -> pd.DataFrame:
+    """Return the total value and number of the records in chunk for each neighbourhood and
+    year."""
+    if record_format.id_column is not None:
+        neighbourhoods = pd.to_numeric(chunk[record_format.id_column], errors='coerce')
+    else:
+        neighbourhoods = pd.Series(spatial_index.locate(
+            spatial_index.load_index(),
+            pd.to_numeric(chunk[record_format.longitude_column], errors='coerce').to_numpy(),
+            pd.to_numeric(chunk[record_format.latitude_column], errors='coerce').to_numpy()),
+            index=chunk.index).where(lambda codes: codes >= 0)
+    periods = pd.to_numeric(chunk[record_format.date_column].str.strip().str[:4],
+                            errors='coerce')
+    if record_format.value_column is not None:
+        values = pd.to_numeric(chunk[record_format.value_column], errors='coerce')
+    else:
+        values = pd.Series(1.0, index=chunk.index)
+
+    records = pd.DataFrame({'neighbourhood': neighbourhoods, 'period': periods,
+                            'value': values}).dropna()
+    records = records.astype({'neighbourhood': int, 'period': int})
+    grouped = records.groupby(['neighbourhood', 'period'])['value']
+    return pd.DataFrame({'total': grouped.sum(), 'count': grouped.size()})
+
+
+def _add_totals(totals: list[pd.DataFrame]) -> pd.DataFrame:
+    """Return the sum of the totals of each neighbourhood and year in totals."""
+    if not totals:
+        index = pd.MultiIndex.from_arrays([[], []], names=['neighbourhood', 'period'])
+        return pd.DataFrame({'total': pd.Series(dtype=float), 'count': pd.Series(dtype=int)},
+                            index=index)
+    return pd.concat(totals).groupby(level=['neighbourhood', 'period']).sum()
+
+
+def _period_table(aggregated: pd.DataFrame, filename: str, statistic: str,
+                  names: Optional[dict[str, str]],
+                  ids: Optional[list[str]] = None) -> ColumnarTable:
+    """Return the given statistic of aggregated as a table with the numeric columns of the
+    data file with the given filename, which must each end in their year, like 'price_2021'.
+
+    The table has a row for each Neighbourhood ID in ids, or for each neighbourhood in
+    aggregated if ids is None.
+    """
+    if names is None:
+        index = spatial_index.load_index()
+        names = {str(code): name for code, name in zip(index.codes, index.names)}
+
+    wide = aggregated.pivot(index='Neighbourhood ID', columns='period', values=statistic)
+    if ids is not None:
+        wide = wide.reindex([int(key) for key in ids])
+    ids = [str(key) for key in wide.index]
+    columns = {}
+    for name in SCHEMAS[filename].numeric:
+        period = int(name.rsplit('_', 1)[1])
+        if period in wide.columns:
+            columns[name] = wide[period].to_numpy(dtype=float)
+        else:
+            columns[name] = np.full(len(ids), np.nan)
+    return ColumnarTable(ids, [names.get(key, '') for key in ids], columns)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['concurrent.futures', 'dataclasses', 'typing', 'numpy', 'pandas',
+                          'spatial_index', 'loader'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,140 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the code that clusters the neighbourhoods under many scenarios at once, where
+each scenario picks its own features, feature weights and number of clusters.
+
+The features are standardized once, so that property prices in the hundreds of thousands do not
+drown out rates in the tens, and every scenario then reads the same standardized data.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import pandas as pd
+import cluster as c
+from neighbourhoods import NeighbourhoodStore
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """One way of clustering the neighbourhoods.
+
+    Instance Attributes:
+        - name: the name of the scenario
+        - features: the columns of the data to cluster on
+        - weights: how much each feature counts, in the same order as features, or None to
+          weigh every feature equally
+        - k: the number of clusters, or None to pick it with the elbow method
+        - dataset: 'covid' to cluster the post-covid data or 'non_covid' for the pre-covid data
+
+    Representation Invariants:
+        - self.weights is None or len(self.weights) == len(self.features)
+        - self.dataset in {'covid', 'non_covid'}
+    """
+    name: str
+    features: tuple[str, ...]
+    weights: Optional[tuple[float, ...]] = None
+    k: Optional[int] = None
+    dataset: str = 'covid'
+
+
+def standardize(matrix: np.ndarray) -> np.ndarray:
+    """Return each column of the matrix shifted to a mean of 0 and scaled to a standard
+    deviation of 1. Columns with no spread are only shifted."""
+    std = matrix.std(axis=0)
+    return (matrix - matrix.mean(axis=0)) / np.where(std == 0, 1, std)
+
+
+def run_scenarios(scenarios: list[Scenario], covid_data: pd.DataFrame,
+                  non_covid_data: pd.DataFrame,
+                  max_workers: Optional[int] = None) -> pd.DataFrame:
+    """Return a table comparing the clusters found under each of the given scenarios.
+
+    covid_data and non_covid_data are the joined post-covid and pre-covid dataframes, such as
+    those returned by cluster.main. Each is standardized once, and the scenarios are then
+    clustered in parallel on max_workers threads, all reading the same standardized data.
+
+    The table has one row per scenario, indexed by its name, with the scenario's dataset,
+    features, weights, number of clusters, inertia and the cluster label of each
+    neighbourhood (see label_table).
+    """
+    standardized = {}
+    for dataset, data in [('covid', covid_data), ('non_covid', non_covid_data)]:
+        columns = [column for column in data.columns if column not in
+                   {'Cluster Labels', 'Neighbourhood ID', 'Neighbourhood Name'}]
+        matrix = standardize(data[columns].to_numpy(dtype=float))
+        # the scenarios share this array, so it is made read-only to keep them from changing it.
+        matrix.setflags(write=False)
+        standardized[dataset] = (data[['Neighbourhood ID', 'Neighbourhood Name']], columns,
+                                 matrix)
+
+    if max_workers is None:
+        max_workers = min(len(scenarios), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda scenario: _run_scenario(scenario, standardized),
+                                    scenarios))
+
+    return pd.DataFrame(results, columns=['scenario', 'dataset', 'features', 'weights', 'k',
+                                          'inertia', 'labels']).set_index('scenario')
+
+
+def label_table(results: pd.DataFrame, data: pd.DataFrame) -> pd.DataFrame:
+    """Return the cluster label of each neighbourhood under each scenario of results, with one
+    row per neighbourhood of data and one column per scenario.
+
+    data must be the dataframe the scenarios were run on, so that its rows line up with the
+    labels.
+    """
+    table = data[['Neighbourhood ID', 'Neighbourhood Name']].copy()
+    for name, labels in results['labels'].items():
+        table[name] = labels
+    return table
+
+
+def _run_scenario(scenario: Scenario,
+                  standardized: dict[str, tuple[pd.DataFrame, list[str], np.ndarray]]) -> list:
+    """Return the row of the comparison table for the given scenario."""
+    ids, columns, matrix = standardized[scenario.dataset]
+    selected = matrix[:, [columns.index(feature) for feature in scenario.features]]
+    if scenario.weights is not None:
+        selected = selected * np.array(scenario.weights)
+
+    k = scenario.k
+    if k is None:
+        k = c.elbow_method(NeighbourhoodStore(ids['Neighbourhood ID'], ids['Neighbourhood Name'],
+                                              scenario.features, selected))
+
+    kmeans = c.fit_kmeans(selected, k)
+    # the weights, signs included, are divided back out, so that the clusters are ordered by
+    # their standardized centers no matter how the features were weighted.
+    scale = np.ones(len(scenario.features))
+    if scenario.weights is not None:
+        scale = np.asarray(scenario.weights, dtype=float)
+    labels = c.order_labels(kmeans.labels_, kmeans.cluster_centers_, list(scenario.features),
+                            scale)
+    return [scenario.name, scenario.dataset, scenario.features, scenario.weights, k,
+            float(kmeans.inertia_), labels]
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'concurrent.futures', 'dataclasses', 'typing', 'numpy',
+                          'pandas', 'cluster', 'neighbourhoods'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
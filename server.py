@@ -0,0 +1,315 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains a small local web server that clusters the data once and then serves the
+maps and the clustered data from memory, so that a dashboard can ask for them again and again
+without paying for a fresh run of the pipeline each time.
+
+Every response is encoded (and compressed) when the data is loaded, so answering a request is
+only a matter of writing out bytes that are already in memory. The server checks the data files
+every few seconds and loads them again in the background when they change, serving the old
+results until the new ones are ready.
+
+Run this file to start the server, then open http://127.0.0.1:8050/ in a browser:
+
+    python server.py --port 8050
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+from plotly.offline import get_plotlyjs
+import cache
+import cluster as c
+import geometry
+import figures
+import export
+import covid_visualization as cv
+import before_covid_visualization as bcv
+
+# The address that the server listens on by default.
+HOST = '127.0.0.1'
+PORT = 8050
+
+# How often, in seconds, the data files are checked for changes.
+POLL_SECONDS = 2.0
+
+# How long, in seconds, an idle connection is kept open.
+KEEP_ALIVE_SECONDS = 30.0
+
+# The files whose changes make the server load the data again.
+INPUT_FILES = c.DATA_FILES + [geometry.GEOJSON_FILE]
+
+# The maps that are served, by the name used in their urls, with their titles and layers.
+MAPS = {'covid': ('Toronto Neighbourhoods During Covid', cv.LAYERS),
+        'before_covid': ('Toronto Neighbourhoods Before Covid', bcv.LAYERS)}
+
+# The reason phrase of each status code that the server sends.
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed'}
+
+
+@dataclass
+class Resource:
+    """A response body that is ready to be sent.
+
+    Instance Attributes:
+        - content_type: the media type of the body
+        - body: the body
+        - compressed: the body compressed with gzip
+        - etag: the entity tag of the body, which a browser sends back to ask whether the body
+          has changed
+    """
+    content_type: str
+    body: bytes
+    compressed: bytes
+    etag: str
+
+
+@dataclass
+class Snapshot:
+    """Everything the server serves for one version of the data files.
+
+    Instance Attributes:
+        - signature: the size and modification time of each input file this was loaded from
+        - loaded_at: the time this was loaded, in seconds since the epoch
+        - load_seconds: how long loading took
+        - resources: the resources served, by their path
+    """
+    signature: tuple
+    loaded_at: float
+    load_seconds: float
+    resources: dict[str, Resource]
+
+
+def input_signature() -> tuple:
+    """Return the size and modification time of each input file, which changes whenever one
+    of them is written."""
+    signature = []
+    for filename in INPUT_FILES:
+        try:
+            stat = os.stat(filename)
+            signature.append((filename, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((filename, None, None))
+    return tuple(signature)
+
+
+def load_snapshot() -> Snapshot:
+    """Return a snapshot of the clustered data and the maps, loaded from the input files as
+    they are now."""
+    start = time.perf_counter()
+    signature = input_signature()
+    # the geometry is cached for the life of the process, so it is dropped in case the geojson
+    # file changed. The clustered data is cached on the contents of the data files already, but
+    # the session cache would otherwise keep every version of it in memory for as long as the
+    # server runs.
+    geometry.load_geojson.cache_clear()
+    geometry.shared_geometry.cache_clear()
+    cache.clear_session()
+
+    covid_data, non_covid_data = c.main()
+    data = {'covid': covid_data, 'before_covid': non_covid_data}
+    geometry_json = json.dumps(geometry.shared_geometry(), separators=(',', ':'))
+
+    resources = {
+        '/' + export.PLOTLY_FILE: _resource('application/javascript', get_plotlyjs()),
+        '/' + export.GEOMETRY_SCRIPT: _resource('application/javascript',
+                                                'var NEIGHBOURHOODS = ' + geometry_json + ';\n'),
+        '/' + export.GEOMETRY_FILE: _resource('application/geo+json', geometry_json),
+    }
+    index = []
+    for name, (title, layers) in MAPS.items():
+        # each snapshot gets its own maps, so nothing is kept from the last version of the data.
+        figure = figures.LazyFigure(lambda frame=data[name]: frame, layers).figure()
+        resources[f'/{name}'] = _resource('text/html', export.HTML_TEMPLATE.format(
+            title=title, plotly_file='/' + export.PLOTLY_FILE,
+            geometry_script='/' + export.GEOMETRY_SCRIPT, figure=export.figure_json(figure)))
+        resources[f'/{name}.json'] = _resource(
+            'application/json', export.figure_json(figure, '/' + export.GEOMETRY_FILE))
+        resources[f'/data/{name}.json'] = _resource('application/json',
+                                                    data[name].to_json(orient='records'))
+        index.append(f'<li><a href="/{name}">{title}</a> '
+                     f'(<a href="/{name}.json">figure</a>, <a href="/data/{name}.json">data</a>)'
+                     f'</li>')
+    resources['/'] = _resource('text/html', '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+                                            '<title>Neighbourhood Watch</title></head><body><ul>'
+                                            + ''.join(index) + '</ul></body></html>\n')
+
+    return Snapshot(signature, time.time(), time.perf_counter() - start, resources)
+
+
+class MapServer:
+    """A web server that serves the maps and the clustered data from a snapshot in memory.
+
+    Instance Attributes:
+        - snapshot: the snapshot being served
+        - poll_seconds: how often the input files are checked for changes
+    """
+    snapshot: Snapshot
+    poll_seconds: float
+
+    # Private Instance Attributes:
+    #   - _reloading: whether a new snapshot is being loaded
+    _reloading: bool
+
+    def __init__(self, snapshot: Snapshot, poll_seconds: float = POLL_SECONDS) -> None:
+        self.snapshot = snapshot
+        self.poll_seconds = poll_seconds
+        self._reloading = False
+
+    async def serve(self, host: str = HOST, port: int = PORT) -> None:
+        """Serve requests on host and port until cancelled."""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        watcher = asyncio.create_task(self.watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+    async def watch(self) -> None:
+        """Load a new snapshot whenever the input files change, until cancelled.
+
+        The snapshot is loaded on another thread, and the old one is served until the new one
+        is ready.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            if self._reloading or input_signature() == self.snapshot.signature:
+                continue
+            self._reloading = True
+            try:
+                self.snapshot = await loop.run_in_executor(None, load_snapshot)
+                print(f'Reloaded the data in {self.snapshot.load_seconds:.2f}s')
+            except Exception as error:  # pylint: disable=broad-except
+                # a file may have been caught half written, which can fail in any number of
+                # ways; it is tried again on the next poll, and the last good snapshot is
+                # served until then.
+                print(f'Could not reload the data: {error!r}')
+            finally:
+                self._reloading = False
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Answer the requests sent over one connection until it is closed."""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'),
+                                                  KEEP_ALIVE_SECONDS)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError):
+                    break
+                keep_alive = self.respond(head, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, head: bytes, writer: asyncio.StreamWriter) -> bool:
+        """Write the response to the request with the given head (its request line and headers)
+        and return whether the connection should be kept open."""
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ')
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if len(parts) != 3:
+            _write_response(writer, 400, None, b'', False)
+            return False
+        method, target, version = parts
+        keep_alive = (headers.get('connection', '').lower() != 'close'
+                      and (version == 'HTTP/1.1'
+                           or headers.get('connection', '').lower() == 'keep-alive'))
+
+        resource = self.find(target.split('?', 1)[0])
+        if method not in {'GET', 'HEAD'}:
+            _write_response(writer, 405, None, b'', keep_alive)
+        elif resource is None:
+            _write_response(writer, 404, None, b'Not Found\n', keep_alive)
+        elif headers.get('if-none-match') == resource.etag:
+            _write_response(writer, 304, resource, b'', keep_alive)
+        else:
+            gzipped = 'gzip' in headers.get('accept-encoding', '')
+            body = resource.compressed if gzipped else resource.body
+            _write_response(writer, 200, resource, body, keep_alive, gzipped,
+                            include_body=method == 'GET')
+        return keep_alive
+
+    def find(self, path: str) -> Optional[Resource]:
+        """Return the resource at path, or None if there is none."""
+        if path == '/status':
+            snapshot = self.snapshot
+            return _resource('application/json', json.dumps(
+                {'loaded_at': snapshot.loaded_at, 'load_seconds': snapshot.load_seconds,
+                 'reloading': self._reloading,
+                 'files': {filename: mtime for filename, _, mtime in snapshot.signature}}))
+        return self.snapshot.resources.get(path)
+
+
+def _resource(content_type: str, text: str) -> Resource:
+    """Return text encoded as a resource of the given media type."""
+    body = text.encode('utf-8')
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    if content_type.startswith('text/') or 'json' in content_type \
+            or 'javascript' in content_type:
+        content_type += '; charset=utf-8'
+    return Resource(content_type, body, gzip.compress(body, compresslevel=6), etag)
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, resource: Optional[Resource],
+                    body: bytes, keep_alive: bool, gzipped: bool = False,
+                    include_body: bool = True) -> None:
+    """Write a response with the given status, body and headers describing resource."""
+    headers = [f'HTTP/1.1 {status} {REASONS[status]}',
+               f'Content-Length: {len(body)}',
+               'Connection: ' + ('keep-alive' if keep_alive else 'close'),
+               'Cache-Control: no-cache']
+    if resource is not None:
+        headers.extend([f'Content-Type: {resource.content_type}', f'ETag: {resource.etag}',
+                        'Vary: Accept-Encoding'])
+    if gzipped:
+        headers.append('Content-Encoding: gzip')
+    writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1'))
+    if include_body and status != 304:
+        writer.write(body)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the maps and the clustered data.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS,
+                        help='how often to check the data files for changes, in seconds')
+    args = parser.parse_args()
+
+    first_snapshot = load_snapshot()
+    print(f'Loaded the data in {first_snapshot.load_seconds:.2f}s; '
+          f'serving on http://{args.host}:{args.port}/')
+    try:
+        asyncio.run(MapServer(first_snapshot, args.poll).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,291 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the spatial index of the neighbourhood boundaries, which finds the
+neighbourhood of millions of points, such as the locations of property listings, at once.
+
+The index lays a grid over the city. A cell that no boundary crosses lies wholly inside one
+neighbourhood (or outside all of them), so its points are placed without any geometry. Only the
+points in cells that a boundary crosses are tested against the polygons, and then only against
+the polygons whose bounding box overlaps the cell, and only against the edges of those polygons
+that are level with the point's row of the grid.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import functools
+import os
+from dataclasses import dataclass, fields
+import numpy as np
+import cache
+import geometry
+from loader import ColumnarTable
+
+# The folder that the prepared indexes are written to.
+INDEX_DIR = os.path.join(cache.CACHE_DIR, 'spatial')
+
+# The number of grid cells along the longer side of the city.
+GRID_CELLS = 1024
+
+# The number of points that are tested against the polygons at a time, which bounds the memory
+# that a query needs.
+BATCH_SIZE = 100000
+
+# The version of the layout of the prepared indexes on disk.
+FORMAT_VERSION = 1
+
+# The values of SpatialIndex.cell_owner for cells that are outside every neighbourhood and for
+# cells that a boundary crosses.
+OUTSIDE = -1
+BOUNDARY = -2
+
+
+@dataclass
+class SpatialIndex:
+    """A grid index over the boundaries of the neighbourhoods.
+
+    The polygons are numbered by their position in the geojson file. Lists of variable length,
+    such as the polygons whose bounding box overlaps each cell, are stored as one flat array of
+    values and an array of offsets, where the values for item i are
+    values[offsets[i]:offsets[i + 1]].
+
+    Instance Attributes:
+        - codes: the AREA_SHORT_CODE of each polygon
+        - names: the name of each polygon's neighbourhood
+        - origin: the longitude and latitude of the corner of the grid
+        - cell_size: the width and height of each cell, in degrees
+        - shape: the number of rows and columns of the grid
+        - edges: the edges of every polygon, one row of x0, y0, x1, y1 per edge
+        - cell_owner: for each cell in row-major order, the polygon that contains the whole
+          cell, or OUTSIDE or BOUNDARY
+        - candidate_offsets, candidates: the polygons whose bounding box overlaps each cell
+        - row_offsets, row_edges: the edges of each polygon that are level with each row of the
+          grid, by polygon * number of rows + row
+    """
+    codes: np.ndarray
+    names: np.ndarray
+    origin: np.ndarray
+    cell_size: np.ndarray
+    shape: np.ndarray
+    edges: np.ndarray
+    cell_owner: np.ndarray
+    candidate_offsets: np.ndarray
+    candidates: np.ndarray
+    row_offsets: np.ndarray
+    row_edges: np.ndarray
+
+
+@functools.lru_cache(maxsize=None)
+def load_index(filename: str = geometry.GEOJSON_FILE, cells: int = GRID_CELLS) -> SpatialIndex:
+    """Return the spatial index of the neighbourhoods in the geojson file.
+
+    The prepared index is cached on disk and is only rebuilt when the geojson file or the
+    number of cells changes.
+    """
+    key = cache.cache_key([filename], {'cells': cells, 'version': FORMAT_VERSION})
+    path = os.path.join(INDEX_DIR, key + '.npz')
+    try:
+        with np.load(path) as arrays:
+            return SpatialIndex(**{name: arrays[name] for name in arrays.files})
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    index = build_index(geometry.load_geojson(filename), cells)
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    with open(path + '.tmp', 'wb') as file:
+        np.savez(file, **{field.name: getattr(index, field.name) for field in fields(index)})
+    os.replace(path + '.tmp', path)
+    return index
+
+
+def build_index(geojson: dict, cells: int = GRID_CELLS) -> SpatialIndex:
+    """Return the spatial index of the polygons in geojson, with a grid of cells cells along
+    the longer side of their bounding box."""
+    codes, names, edge_list = [], [], []
+    for feature in geojson['features']:
+        properties = feature['properties']
+        codes.append(int(properties['AREA_SHORT_CODE']))
+        names.append(properties['AREA_NAME'].rsplit(' (', 1)[0])
+        polygon_edges = []
+        for polygon in geometry._polygons(feature['geometry']):
+            for ring in polygon:
+                points = np.asarray(ring, dtype=float)[:, :2]
+                polygon_edges.append(np.hstack([points, np.roll(points, -1, axis=0)]))
+        edge_list.append(np.vstack(polygon_edges))
+
+    edges = np.vstack(edge_list)
+    edge_polygons = np.repeat(np.arange(len(edge_list)), [len(e) for e in edge_list])
+    low = np.minimum(edges[:, :2], edges[:, 2:])
+    high = np.maximum(edges[:, :2], edges[:, 2:])
+
+    origin = low.min(axis=0)
+    size = (high.max(axis=0) - origin).max() / cells
+    cell_size = np.array([size, size])
+    shape = np.ceil((high.max(axis=0) - origin) / size).astype(int)[::-1] + 1
+    rows, columns = shape
+
+    # the cells that each edge's bounding box covers are the cells the edge may cross.
+    first = ((low - origin) // size).astype(int)
+    last = ((high - origin) // size).astype(int)
+    _, cell = _expand_boxes(first, last, columns)
+    boundary = np.zeros(rows * columns, dtype=bool)
+    boundary[cell] = True
+
+    # the edges of each polygon, grouped by the rows of the grid they are level with.
+    edge_row, row = _expand(first[:, 1], last[:, 1] - first[:, 1] + 1)
+    row_offsets, row_edges = _group(edge_polygons[edge_row] * rows + row, edge_row,
+                                    len(edge_list) * rows)
+
+    # the polygons whose bounding box overlaps each cell.
+    polygon_first = np.vstack([first[edge_polygons == i].min(axis=0)
+                               for i in range(len(edge_list))])
+    polygon_last = np.vstack([last[edge_polygons == i].max(axis=0)
+                              for i in range(len(edge_list))])
+    polygon_of_cell, cell = _expand_boxes(polygon_first, polygon_last, columns)
+    candidate_offsets, candidates = _group(cell, polygon_of_cell, rows * columns)
+
+    index = SpatialIndex(np.array(codes), np.array(names, dtype=str), origin, cell_size, shape,
+                         edges, np.where(boundary, BOUNDARY, OUTSIDE).astype(np.int32),
+                         candidate_offsets, candidates, row_offsets, row_edges)
+
+    # a cell that no boundary crosses belongs wholly to the polygon that contains its centre.
+    inner = np.flatnonzero(~boundary & (np.diff(candidate_offsets) > 0))
+    centres = origin + (np.column_stack([inner % columns, inner // columns]) + 0.5) * size
+    index.cell_owner[inner] = _test_polygons(index, centres, inner)
+    return index
+
+
+def locate(index: SpatialIndex, longitudes: np.ndarray, latitudes: np.ndarray) -> np.ndarray:
+    """Return the AREA_SHORT_CODE of the neighbourhood that contains each point, or -1 for
+    points outside every neighbourhood."""
+    polygons = polygon_positions(index, longitudes, latitudes)
+    return np.where(polygons >= 0, index.codes[polygons], -1)
+
+
+def polygon_positions(index: SpatialIndex, longitudes: np.ndarray,
+                      latitudes: np.ndarray) -> np.ndarray:
+    """Return the position in index of the polygon that contains each point, or OUTSIDE for
+    points outside every polygon."""
+    points = np.column_stack([np.asarray(longitudes, dtype=float),
+                              np.asarray(latitudes, dtype=float)])
+    rows, columns = index.shape
+    grid = np.floor((points - index.origin) / index.cell_size)
+    # points with a missing coordinate are off the grid.
+    grid = np.where(np.isfinite(grid), grid, -1).astype(int)
+    on_grid = ((grid >= 0) & (grid < [columns, rows])).all(axis=1)
+    cell = np.where(on_grid, grid[:, 1] * columns + grid[:, 0], 0)
+
+    positions = np.where(on_grid, index.cell_owner[cell], OUTSIDE)
+    to_test = np.flatnonzero(positions == BOUNDARY)
+    for start in range(0, len(to_test), BATCH_SIZE):
+        batch = to_test[start:start + BATCH_SIZE]
+        positions[batch] = _test_polygons(index, points[batch], cell[batch])
+    return positions
+
+
+def aggregate(index: SpatialIndex, longitudes: np.ndarray, latitudes: np.ndarray,
+              values: dict[str, np.ndarray]) -> ColumnarTable:
+    """Return the mean of each column of values over the points in each neighbourhood, as a
+    table with one row per neighbourhood, like those that cluster.join_features takes.
+
+    The table also has a 'count' column with the number of points in each neighbourhood.
+    Points outside every neighbourhood are left out, as are missing (nan) values. The mean of a
+    column is nan for a neighbourhood with no values in it.
+    """
+    positions = polygon_positions(index, longitudes, latitudes)
+    inside = positions >= 0
+    positions = positions[inside]
+    count = len(index.codes)
+
+    columns = {}
+    for name, column in values.items():
+        column = np.asarray(column, dtype=float)[inside]
+        present = ~np.isnan(column)
+        totals = np.bincount(positions[present], weights=column[present], minlength=count)
+        counts = np.bincount(positions[present], minlength=count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns[name] = totals / counts
+    columns['count'] = np.bincount(positions, minlength=count).astype(float)
+
+    return ColumnarTable([str(code) for code in index.codes], index.names.tolist(), columns)
+
+
+def _test_polygons(index: SpatialIndex, points: np.ndarray, cells: np.ndarray) -> np.ndarray:
+    """Return the position of the polygon that contains each point, or OUTSIDE, testing each
+    point against the candidate polygons of its cell in cells.
+
+    A point is inside a polygon when a ray from it towards increasing longitude crosses the
+    polygon's edges an odd number of times. Only the edges level with the point's row of the
+    grid can be crossed.
+    """
+    rows = index.shape[0]
+    point_rows = cells // index.shape[1]
+
+    # one pair for each point and each candidate polygon of its cell.
+    pair_point, candidate = _expand(index.candidate_offsets[cells],
+                                    np.diff(index.candidate_offsets)[cells])
+    pair_polygon = index.candidates[candidate]
+
+    # one test for each pair and each edge of the polygon level with the point.
+    group = pair_polygon * rows + point_rows[pair_point]
+    test_pair, edge = _expand(index.row_offsets[group], np.diff(index.row_offsets)[group])
+    x0, y0, x1, y1 = index.edges[index.row_edges[edge]].T
+    x, y = points[pair_point[test_pair]].T
+
+    straddles = (y0 > y) != (y1 > y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        crosses = straddles & (x < x0 + (y - y0) * (x1 - x0) / (y1 - y0))
+    inside = np.bincount(test_pair, weights=crosses, minlength=len(pair_point)) % 2 == 1
+
+    positions = np.full(len(points), OUTSIDE)
+    # polygons only meet along their boundaries, so each point is inside at most one of them.
+    positions[pair_point[inside]] = pair_polygon[inside]
+    return positions
+
+
+def _expand(starts: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return, for every item i, counts[i] copies of i alongside the numbers starts[i],
+    starts[i] + 1, ..., starts[i] + counts[i] - 1."""
+    items = np.repeat(np.arange(len(counts)), counts)
+    steps = np.arange(len(items)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return items, np.repeat(starts, counts) + steps
+
+
+def _expand_boxes(first: np.ndarray, last: np.ndarray,
+                  columns: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return, for every box of cells from the column and row in first to those in last, the
+    box's position alongside each cell it covers, in row-major order."""
+    widths = last[:, 0] - first[:, 0] + 1
+    heights = last[:, 1] - first[:, 1] + 1
+    boxes, steps = _expand(np.zeros(len(first), dtype=int), widths * heights)
+    return boxes, ((first[boxes, 1] + steps // widths[boxes]) * columns
+                   + first[boxes, 0] + steps % widths[boxes])
+
+
+def _group(keys: np.ndarray, values: np.ndarray, count: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return the offsets and values of the lists of values with each of count keys, as 32 bit
+    integers to keep the index small on disk."""
+    order = np.argsort(keys, kind='stable')
+    offsets = np.zeros(count + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum(np.bincount(keys, minlength=count))
+    return offsets, values[order].astype(np.int32)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['functools', 'os', 'dataclasses', 'numpy', 'cache', 'geometry',
+                          'loader'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200', 'W0212']
+    })
@@ -0,0 +1,60 @@
+"""Neighbourhood Watch: How Covid-19 Impacted Toronto's Real Estate Market
+===============================
+This file contains the animated map, which steps through the periods of the period-aware
+pipeline on a single map instead of showing each period on a map of its own.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the marking purposes of TA's of CSC110 at the
+University of Tears St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC110 materials,
+please consult TA rules.
+
+This file is Copyright (c) 2021 Minha Faheem, Sohee Goo, Julia Bulat, and Rumaisa Chowdhury.
+"""
+# Import libraries
+import pandas as pd
+from plotly import graph_objects as go
+import figures
+import periods
+
+
+def load_result() -> pd.DataFrame:
+    """Return the long table of the clusters before and during covid, in that order."""
+    return periods.load_periods([periods.PRE_COVID, periods.COVID])
+
+
+# The layers of the map. Each must be a feature of every period, or the desirability index.
+LAYERS = [
+    figures.Layer('desirability', 'Desirability Index',
+                  'Toronto Neighbourhoods Desirability Index', 'Cluster Labels', 'Burg',
+                  figures.DESIRABILITY_COLORBAR),
+    figures.Layer('price', 'Property Prices', 'Average Property Prices in Toronto Neighbourhood',
+                  'Avg Property Price', 'tealrose',
+                  {'title': 'Average Property Price (in millions)'}),
+    figures.Layer('unemployment', 'Unemployment Rate',
+                  'Unemployment Rate in Toronto Neighbourhoods', 'Avg Unemployment Rate',
+                  'darkmint', {'title': 'Average Unemployment Rate (Percentage)'}),
+    figures.Layer('crime', 'Crime Rate', 'Crime Rate in Toronto Neighbourhoods',
+                  'Avg Crime Rate', 'Purpor', {'title': 'Average Crime Rate (per 100,000 people)'})
+]
+
+# The animated map, which is only built when it is first asked for.
+TIMELINE_MAP = figures.AnimatedFigure(load_result, LAYERS)
+
+
+def build_figure(layer: str = 'desirability') -> go.Figure:
+    """Return the animated map of every layer, showing the given layer first."""
+    return TIMELINE_MAP.figure(layer)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['pandas', 'plotly', 'figures', 'periods'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })